@@ -9,21 +9,75 @@ with branding and custom content capabilities.
 
 import os
 import sys
+import io
 import json
 import time
+import asyncio
 import threading
 import signal
+import stat
 import logging
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
+import hashlib
+import mimetypes
+import gzip
+import ctypes
+import ctypes.util
+from string import Template
+from html import escape
+from bisect import bisect_left
+from functools import partial
+from http import HTTPStatus
+from http.client import parse_headers
+from email.utils import formatdate
+from urllib.parse import urlparse, parse_qs, unquote
 import socket
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Configuration
 RESPONSE_PORTS = [int(p) for p in os.getenv('RESPONSE_PORTS', '101,200,300,301').split(',')]
 RESPONSE_MSG = os.getenv('RESPONSE_MSG', 'Mastermind VPS Toolkit')
 SERVER_NAME = os.getenv('SERVER_NAME', socket.gethostname())
 ADMIN_EMAIL = os.getenv('ADMIN_EMAIL', 'admin@example.com')
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+STATUS_CACHE_TTL = float(os.getenv('STATUS_CACHE_TTL', '2'))  # seconds live pages are reused
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '256'))  # smaller bodies are sent as-is
+# (gzip level, brotli quality): maximum for pages encoded once, cheap for live pages re-encoded every TTL
+COMPRESS_LEVELS = (9, 11)
+LIVE_COMPRESS_LEVELS = (int(os.getenv('LIVE_GZIP_LEVEL', '5')), int(os.getenv('LIVE_BROTLI_QUALITY', '4')))
+KEEPALIVE_TIMEOUT = int(os.getenv('KEEPALIVE_TIMEOUT', '15'))  # idle seconds before closing
+KEEPALIVE_MAX_REQUESTS = int(os.getenv('KEEPALIVE_MAX_REQUESTS', '100'))  # requests per connection
+PORT_CONCURRENCY = int(os.getenv('PORT_CONCURRENCY', '64'))  # requests in flight per port
+PORT_MAX_CONNECTIONS = int(os.getenv('PORT_MAX_CONNECTIONS', '1024'))  # open connections per port
+MAX_REQUEST_BODY = int(os.getenv('MAX_REQUEST_BODY', '1048576'))  # bytes accepted in a POST body
+
+# Slowloris protection: each phase of a request must complete within its own deadline
+REQUEST_LINE_TIMEOUT = float(os.getenv('REQUEST_LINE_TIMEOUT', '10'))  # first byte to end of request line
+HEADER_TIMEOUT = float(os.getenv('HEADER_TIMEOUT', '10'))  # whole header block
+BODY_TIMEOUT = float(os.getenv('BODY_TIMEOUT', '30'))  # whole request body
+WRITE_TIMEOUT = float(os.getenv('WRITE_TIMEOUT', '30'))  # flushing one response to a client that stopped reading
+MAX_HEADER_BYTES = int(os.getenv('MAX_HEADER_BYTES', '16384'))  # request line or header block size
+MAX_HEADERS = int(os.getenv('MAX_HEADERS', '64'))  # header lines per request
+GUARD_COUNTERS = ('idle_timeouts', 'request_line_timeouts', 'header_timeouts', 'body_timeouts',
+                  'oversized_headers', 'too_many_headers')
+TEMPLATE_DIR = os.getenv('TEMPLATE_DIR', '/etc/mastermind/templates')  # main.html, status.html, ... override built-ins
+BRANDING_FILE = os.getenv('BRANDING_FILE', '/etc/default/python-proxy')  # RESPONSE_MSG, SERVER_NAME, ADMIN_EMAIL
+TEMPLATE_POLL_INTERVAL = float(os.getenv('TEMPLATE_POLL_INTERVAL', '2'))  # seconds, when inotify is unavailable
+STATIC_DIR = os.getenv('STATIC_DIR', '/opt/mastermind/static')  # logos, QR images, client configs
+STATIC_PREFIX = '/static/'
+STATIC_STAT_TTL = float(os.getenv('STATIC_STAT_TTL', '1'))  # seconds file metadata is trusted
+STATIC_CACHE_ENTRIES = int(os.getenv('STATIC_CACHE_ENTRIES', '1024'))
+STATIC_SEND_TIMEOUT = float(os.getenv('STATIC_SEND_TIMEOUT', '300'))  # whole file body to one client
+
+# inotify events that mean a template or branding file was written, replaced or removed
+INOTIFY_MASK = 0x8 | 0x40 | 0x80 | 0x100 | 0x200  # CLOSE_WRITE, MOVED_FROM, MOVED_TO, CREATE, DELETE
+
+# Latency histogram bucket upper bounds in seconds; slower requests land in an overflow bucket
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRIC_ROUTES = ('/', '/status', '/info', '/api/status', '/config')  # plus /static; anything else is "other"
 
 # Setup logging
 logging.basicConfig(
@@ -36,161 +90,134 @@ logging.basicConfig(
 )
 logger = logging.getLogger('ResponseServers')
 
-class CustomResponseHandler(BaseHTTPRequestHandler):
-    """Custom HTTP response handler with branding"""
+def select_encoding(accept_encoding, available):
+    """Pick the best available content coding for an Accept-Encoding header"""
+    if not accept_encoding or len(available) == 1:
+        return 'identity'
+        
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+        
+    wildcard = qualities.get('*', 0.0)
+    best, best_quality = 'identity', 0.0
+    for coding in ('br', 'gzip'):
+        quality = qualities.get(coding, wildcard)
+        if coding in available and quality > best_quality:
+            best, best_quality = coding, quality
+    return best
     
-    def do_GET(self):
-        """Handle GET requests"""
-        try:
-            path = self.path
-            port = self.server.server_port
-            
-            # Parse query parameters
-            parsed_url = urlparse(path)
-            query_params = parse_qs(parsed_url.query)
-            
-            # Route based on path
-            if parsed_url.path == '/':
-                self.serve_main_page(port)
-            elif parsed_url.path == '/status':
-                self.serve_status_page(port)
-            elif parsed_url.path == '/info':
-                self.serve_info_page(port)
-            elif parsed_url.path == '/api/status':
-                self.serve_api_status(port)
-            elif parsed_url.path == '/config':
-                self.serve_config_page(port)
-            else:
-                self.serve_404_page()
-                
-        except Exception as e:
-            logger.error(f"Error handling GET request: {e}")
-            self.serve_error_page(500, "Internal Server Error")
+class CachedResponse:
+    """Fully encoded response body with its precomputed headers
     
-    def do_POST(self):
-        """Handle POST requests"""
-        try:
-            content_length = int(self.headers.get('Content-Length', 0))
-            post_data = self.rfile.read(content_length)
-            
-            # Simple echo for POST requests
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Server', f'Mastermind-Response/{self.server.server_port}')
-            self.end_headers()
-            
-            response = {
-                'status': 'success',
-                'message': 'POST request received',
-                'port': self.server.server_port,
-                'timestamp': time.time(),
-                'data_received': len(post_data)
-            }
+    Compressed variants are produced once here, so serving a cached page
+    never compresses anything per request. Live pages (ttl set) are encoded
+    again on every expiry on the event loop, so they use cheaper levels.
+    """
+    
+    def __init__(self, status, content_type, body, port, ttl=None, extra_headers=()):
+        self.status = status
+        self.body = body
+        self.created = time.time()
+        self.ttl = ttl
+        
+        encoded = {'identity': body}
+        if len(body) >= COMPRESS_MIN_SIZE:
+            gzip_level, brotli_quality = COMPRESS_LEVELS if ttl is None else LIVE_COMPRESS_LEVELS
+            encoded['gzip'] = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+            if brotli is not None:
+                encoded['br'] = brotli.compress(body, quality=brotli_quality)
+            encoded = {coding: data for coding, data in encoded.items() if len(data) <= len(body)}
             
-            self.wfile.write(json.dumps(response, indent=2).encode('utf-8'))
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        self.etag = f'"{digest}"'
+        self.variants = {}
+        for coding, data in encoded.items():
+            etag = self.etag if coding == 'identity' else f'"{digest}-{coding}"'
+            headers = [
+                ('Content-type', content_type),
+                ('Server', f'Mastermind-Response/{port}'),
+                ('Content-Length', str(len(data))),
+                ('ETag', etag),
+                ('Cache-Control', 'no-cache')
+            ]
+            if coding != 'identity':
+                headers.append(('Content-Encoding', coding))
+            if len(encoded) > 1:
+                headers.append(('Vary', 'Accept-Encoding'))
+            headers.extend(extra_headers)
+            self.variants[coding] = (data, etag, headers)
             
-        except Exception as e:
-            logger.error(f"Error handling POST request: {e}")
-            self.serve_error_page(500, "Internal Server Error")
-    
-    def serve_main_page(self, port):
-        """Serve the main branded page"""
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.send_header('Server', f'Mastermind-Response/{port}')
-        self.end_headers()
-        
-        html = self.generate_main_html(port)
-        self.wfile.write(html.encode('utf-8'))
-    
-    def serve_status_page(self, port):
-        """Serve status page"""
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.send_header('Server', f'Mastermind-Response/{port}')
-        self.end_headers()
-        
-        html = self.generate_status_html(port)
-        self.wfile.write(html.encode('utf-8'))
-    
-    def serve_info_page(self, port):
-        """Serve info page"""
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.send_header('Server', f'Mastermind-Response/{port}')
-        self.end_headers()
-        
-        html = self.generate_info_html(port)
-        self.wfile.write(html.encode('utf-8'))
-    
-    def serve_api_status(self, port):
-        """Serve API status in JSON format"""
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Server', f'Mastermind-Response/{port}')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
+    def expired(self):
+        """Check whether a live page needs re-rendering"""
+        return self.ttl is not None and time.time() - self.created > self.ttl
         
-        status_data = {
-            'status': 'online',
-            'server': SERVER_NAME,
-            'port': port,
-            'service': 'Mastermind Response Server',
-            'version': '1.0.0',
-            'timestamp': time.time(),
-            'uptime': time.time() - self.server.start_time,
-            'requests_served': getattr(self.server, 'request_count', 0)
-        }
+    def select(self, accept_encoding):
+        """Return (body, etag, headers) for the negotiated content coding"""
+        return self.variants[select_encoding(accept_encoding, self.variants)]
         
-        self.wfile.write(json.dumps(status_data, indent=2).encode('utf-8'))
+class ResponseCache:
+    """Render cache for static pages keyed by (port, path, config version)
     
-    def serve_config_page(self, port):
-        """Serve configuration page"""
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.send_header('Server', f'Mastermind-Response/{port}')
-        self.end_headers()
-        
-        html = self.generate_config_html(port)
-        self.wfile.write(html.encode('utf-8'))
+    Pages are rendered and encoded once; bumping the version on a
+    configuration change makes every old entry unreachable at once.
+    """
     
-    def serve_404_page(self):
-        """Serve 404 page"""
-        self.send_response(404)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.send_header('Server', f'Mastermind-Response/{self.server.server_port}')
-        self.end_headers()
-        
-        html = self.generate_404_html()
-        self.wfile.write(html.encode('utf-8'))
-    
-    def serve_error_page(self, code, message):
-        """Serve error page"""
-        self.send_response(code)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.send_header('Server', f'Mastermind-Response/{self.server.server_port}')
-        self.end_headers()
-        
-        html = self.generate_error_html(code, message)
-        self.wfile.write(html.encode('utf-8'))
-    
-    def generate_main_html(self, port):
-        """Generate main page HTML"""
-        return f"""
-<!DOCTYPE html>
+    def __init__(self):
+        self.version = 1
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+    def get(self, port, path, render):
+        """Return the cached response, rendering it on first use"""
+        key = (port, path, self.version)
+        entry = self.entries.get(key)
+        if entry is not None and not entry.expired():
+            self.hits += 1
+            return entry
+            
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.expired():
+                self.misses += 1
+                entry = render()
+                self.entries[key] = entry
+            return entry
+            
+    def invalidate(self):
+        """Drop all cached pages after a configuration change"""
+        with self.lock:
+            self.version += 1
+            self.entries = {}
+            
+response_cache = ResponseCache()
+
+# Built-in page templates (string.Template syntax); files in TEMPLATE_DIR override them
+DEFAULT_TEMPLATES = {
+    'main': """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{RESPONSE_MSG} - Port {port}</title>
+    <title>$response_msg - Port $port</title>
     <style>
-        * {{
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
         
-        body {{
+        body {
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
@@ -198,9 +225,9 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
             display: flex;
             align-items: center;
             justify-content: center;
-        }}
+        }
         
-        .container {{
+        .container {
             max-width: 800px;
             margin: 0 auto;
             padding: 40px;
@@ -209,47 +236,47 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
             backdrop-filter: blur(10px);
             text-align: center;
             box-shadow: 0 8px 32px rgba(0,0,0,0.3);
-        }}
+        }
         
-        .logo {{
+        .logo {
             font-size: 3em;
             font-weight: bold;
             margin-bottom: 20px;
             text-shadow: 2px 2px 4px rgba(0,0,0,0.5);
-        }}
+        }
         
-        .port {{
+        .port {
             font-size: 4em;
             font-weight: bold;
             color: #ffd700;
             margin: 20px 0;
             text-shadow: 2px 2px 4px rgba(0,0,0,0.5);
-        }}
+        }
         
-        .info-grid {{
+        .info-grid {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
             gap: 20px;
             margin: 30px 0;
-        }}
+        }
         
-        .info-card {{
+        .info-card {
             background: rgba(255,255,255,0.1);
             padding: 20px;
             border-radius: 10px;
             border: 1px solid rgba(255,255,255,0.2);
-        }}
+        }
         
-        .info-card h3 {{
+        .info-card h3 {
             margin-bottom: 10px;
             color: #ffd700;
-        }}
+        }
         
-        .navigation {{
+        .navigation {
             margin-top: 30px;
-        }}
+        }
         
-        .nav-link {{
+        .nav-link {
             display: inline-block;
             margin: 0 10px;
             padding: 10px 20px;
@@ -258,28 +285,28 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
             text-decoration: none;
             border-radius: 5px;
             transition: background 0.3s;
-        }}
+        }
         
-        .nav-link:hover {{
+        .nav-link:hover {
             background: rgba(255,255,255,0.3);
-        }}
+        }
         
-        .timestamp {{
+        .timestamp {
             margin-top: 20px;
             opacity: 0.8;
             font-size: 0.9em;
-        }}
+        }
     </style>
 </head>
 <body>
     <div class="container">
-        <div class="logo">{RESPONSE_MSG}</div>
-        <div class="port">Port {port}</div>
+        <div class="logo">$response_msg</div>
+        <div class="port">Port $port</div>
         
         <div class="info-grid">
             <div class="info-card">
                 <h3>Server</h3>
-                <p>{SERVER_NAME}</p>
+                <p>$server_name</p>
             </div>
             <div class="info-card">
                 <h3>Status</h3>
@@ -303,98 +330,91 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
         </div>
         
         <div class="timestamp">
-            Current Time: {time.strftime('%Y-%m-%d %H:%M:%S %Z')}
+            Page Generated: $generated
         </div>
     </div>
 </body>
 </html>
-        """
-    
-    def generate_status_html(self, port):
-        """Generate status page HTML"""
-        uptime = time.time() - getattr(self.server, 'start_time', time.time())
-        uptime_str = f"{int(uptime // 3600):02d}:{int((uptime % 3600) // 60):02d}:{int(uptime % 60):02d}"
-        
-        return f"""
-<!DOCTYPE html>
+""",
+    'status': """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Status - {RESPONSE_MSG}</title>
+    <title>Status - $response_msg</title>
     <style>
-        body {{
+        body {
             font-family: 'Courier New', monospace;
             background: #1a1a1a;
             color: #00ff00;
             padding: 20px;
             margin: 0;
-        }}
+        }
         
-        .terminal {{
+        .terminal {
             background: #000;
             padding: 20px;
             border-radius: 5px;
             border: 2px solid #00ff00;
             max-width: 800px;
             margin: 0 auto;
-        }}
+        }
         
-        .header {{
+        .header {
             color: #00ffff;
             text-align: center;
             margin-bottom: 20px;
             font-size: 1.5em;
-        }}
+        }
         
-        .status-line {{
+        .status-line {
             margin: 10px 0;
             padding: 5px;
             border-left: 3px solid #00ff00;
             padding-left: 10px;
-        }}
+        }
         
-        .status-ok {{
+        .status-ok {
             color: #00ff00;
-        }}
+        }
         
-        .status-warning {{
+        .status-warning {
             color: #ffff00;
-        }}
+        }
         
-        .status-error {{
+        .status-error {
             color: #ff0000;
-        }}
+        }
         
-        .nav-back {{
+        .nav-back {
             margin-top: 20px;
             text-align: center;
-        }}
+        }
         
-        .nav-back a {{
+        .nav-back a {
             color: #00ffff;
             text-decoration: none;
-        }}
+        }
     </style>
 </head>
 <body>
     <div class="terminal">
-        <div class="header">SYSTEM STATUS - PORT {port}</div>
+        <div class="header">SYSTEM STATUS - PORT $port</div>
         
         <div class="status-line status-ok">
             [OK] Service Status: ONLINE
         </div>
         <div class="status-line status-ok">
-            [OK] Port {port}: LISTENING
+            [OK] Port $port: LISTENING
         </div>
         <div class="status-line status-ok">
-            [OK] Server: {SERVER_NAME}
+            [OK] Server: $server_name
         </div>
         <div class="status-line status-ok">
-            [OK] Uptime: {uptime_str}
+            [OK] Uptime: $uptime
         </div>
         <div class="status-line status-ok">
-            [OK] Requests Served: {getattr(self.server, 'request_count', 0)}
+            [OK] Requests Served: $requests_served
         </div>
         <div class="status-line status-ok">
             [OK] Memory Usage: Normal
@@ -409,100 +429,96 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
     </div>
 </body>
 </html>
-        """
-    
-    def generate_info_html(self, port):
-        """Generate info page HTML"""
-        return f"""
-<!DOCTYPE html>
+""",
+    'info': """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Information - {RESPONSE_MSG}</title>
+    <title>Information - $response_msg</title>
     <style>
-        body {{
+        body {
             font-family: Arial, sans-serif;
             background: #f0f2f5;
             color: #333;
             margin: 0;
             padding: 20px;
-        }}
+        }
         
-        .container {{
+        .container {
             max-width: 800px;
             margin: 0 auto;
             background: white;
             border-radius: 10px;
             box-shadow: 0 4px 6px rgba(0,0,0,0.1);
             overflow: hidden;
-        }}
+        }
         
-        .header {{
+        .header {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 30px;
             text-align: center;
-        }}
+        }
         
-        .content {{
+        .content {
             padding: 30px;
-        }}
+        }
         
-        .info-section {{
+        .info-section {
             margin-bottom: 30px;
-        }}
+        }
         
-        .info-section h3 {{
+        .info-section h3 {
             color: #667eea;
             border-bottom: 2px solid #667eea;
             padding-bottom: 10px;
             margin-bottom: 15px;
-        }}
+        }
         
-        .info-table {{
+        .info-table {
             width: 100%;
             border-collapse: collapse;
             margin-top: 10px;
-        }}
+        }
         
         .info-table th,
-        .info-table td {{
+        .info-table td {
             padding: 12px;
             text-align: left;
             border-bottom: 1px solid #ddd;
-        }}
+        }
         
-        .info-table th {{
+        .info-table th {
             background: #f8f9fa;
             font-weight: bold;
-        }}
+        }
         
-        .nav-back {{
+        .nav-back {
             text-align: center;
             margin-top: 20px;
-        }}
+        }
         
-        .nav-back a {{
+        .nav-back a {
             color: #667eea;
             text-decoration: none;
             font-weight: bold;
-        }}
+        }
     </style>
 </head>
 <body>
     <div class="container">
         <div class="header">
             <h1>Server Information</h1>
-            <p>Port {port} Details</p>
+            <p>Port $port Details</p>
         </div>
         
         <div class="content">
             <div class="info-section">
                 <h3>Server Details</h3>
                 <table class="info-table">
-                    <tr><th>Server Name</th><td>{SERVER_NAME}</td></tr>
-                    <tr><th>Port</th><td>{port}</td></tr>
+                    <tr><th>Server Name</th><td>$server_name</td></tr>
+                    <tr><th>Port</th><td>$port</td></tr>
                     <tr><th>Service</th><td>Mastermind Response Server</td></tr>
                     <tr><th>Version</th><td>1.0.0</td></tr>
                     <tr><th>Protocol</th><td>HTTP/1.1</td></tr>
@@ -512,7 +528,7 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
             <div class="info-section">
                 <h3>Contact Information</h3>
                 <table class="info-table">
-                    <tr><th>Administrator</th><td>{ADMIN_EMAIL}</td></tr>
+                    <tr><th>Administrator</th><td>$admin_email</td></tr>
                     <tr><th>Support</th><td>Technical Support Available</td></tr>
                 </table>
             </div>
@@ -536,97 +552,93 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
     </div>
 </body>
 </html>
-        """
-    
-    def generate_config_html(self, port):
-        """Generate configuration page HTML"""
-        return f"""
-<!DOCTYPE html>
+""",
+    'config': """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Configuration - {RESPONSE_MSG}</title>
+    <title>Configuration - $response_msg</title>
     <style>
-        body {{
+        body {
             font-family: 'Courier New', monospace;
             background: #2d3748;
             color: #e2e8f0;
             margin: 0;
             padding: 20px;
-        }}
+        }
         
-        .config-container {{
+        .config-container {
             max-width: 900px;
             margin: 0 auto;
             background: #1a202c;
             border-radius: 8px;
             padding: 30px;
             border: 1px solid #4a5568;
-        }}
+        }
         
-        .config-header {{
+        .config-header {
             text-align: center;
             margin-bottom: 30px;
             color: #63b3ed;
-        }}
+        }
         
-        .config-section {{
+        .config-section {
             margin-bottom: 25px;
             background: #2d3748;
             padding: 20px;
             border-radius: 6px;
             border-left: 4px solid #63b3ed;
-        }}
+        }
         
-        .config-section h3 {{
+        .config-section h3 {
             color: #63b3ed;
             margin-top: 0;
             margin-bottom: 15px;
-        }}
+        }
         
-        .config-item {{
+        .config-item {
             margin: 8px 0;
             display: flex;
-        }}
+        }
         
-        .config-key {{
+        .config-key {
             color: #f7fafc;
             font-weight: bold;
             min-width: 200px;
-        }}
+        }
         
-        .config-value {{
+        .config-value {
             color: #68d391;
-        }}
+        }
         
-        .nav-back {{
+        .nav-back {
             text-align: center;
             margin-top: 20px;
-        }}
+        }
         
-        .nav-back a {{
+        .nav-back a {
             color: #63b3ed;
             text-decoration: none;
-        }}
+        }
     </style>
 </head>
 <body>
     <div class="config-container">
         <div class="config-header">
             <h1>Server Configuration</h1>
-            <p>Port {port} Configuration Details</p>
+            <p>Port $port Configuration Details</p>
         </div>
         
         <div class="config-section">
             <h3>Server Configuration</h3>
             <div class="config-item">
                 <span class="config-key">server_name:</span>
-                <span class="config-value">"{SERVER_NAME}"</span>
+                <span class="config-value">"$server_name"</span>
             </div>
             <div class="config-item">
                 <span class="config-key">port:</span>
-                <span class="config-value">{port}</span>
+                <span class="config-value">$port</span>
             </div>
             <div class="config-item">
                 <span class="config-key">service_type:</span>
@@ -642,11 +654,11 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
             <h3>Branding Configuration</h3>
             <div class="config-item">
                 <span class="config-key">brand_message:</span>
-                <span class="config-value">"{RESPONSE_MSG}"</span>
+                <span class="config-value">"$response_msg"</span>
             </div>
             <div class="config-item">
                 <span class="config-key">admin_email:</span>
-                <span class="config-value">"{ADMIN_EMAIL}"</span>
+                <span class="config-value">"$admin_email"</span>
             </div>
         </div>
         
@@ -654,15 +666,15 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
             <h3>Runtime Configuration</h3>
             <div class="config-item">
                 <span class="config-key">start_time:</span>
-                <span class="config-value">{getattr(self.server, 'start_time', time.time())}</span>
+                <span class="config-value">$start_time</span>
             </div>
             <div class="config-item">
                 <span class="config-key">requests_served:</span>
-                <span class="config-value">{getattr(self.server, 'request_count', 0)}</span>
+                <span class="config-value">$requests_served</span>
             </div>
             <div class="config-item">
                 <span class="config-key">log_level:</span>
-                <span class="config-value">"{LOG_LEVEL}"</span>
+                <span class="config-value">"$log_level"</span>
             </div>
         </div>
         
@@ -672,19 +684,15 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
     </div>
 </body>
 </html>
-        """
-    
-    def generate_404_html(self):
-        """Generate 404 page HTML"""
-        return f"""
-<!DOCTYPE html>
+""",
+    '404': """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>404 - Page Not Found</title>
     <style>
-        body {{
+        body {
             font-family: Arial, sans-serif;
             background: linear-gradient(135deg, #ff6b6b, #ee5a52);
             color: white;
@@ -694,39 +702,39 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
             align-items: center;
             justify-content: center;
             min-height: 100vh;
-        }}
+        }
         
-        .error-container {{
+        .error-container {
             text-align: center;
             background: rgba(0,0,0,0.3);
             padding: 40px;
             border-radius: 15px;
             backdrop-filter: blur(10px);
-        }}
+        }
         
-        .error-code {{
+        .error-code {
             font-size: 6em;
             font-weight: bold;
             margin-bottom: 20px;
-        }}
+        }
         
-        .error-message {{
+        .error-message {
             font-size: 1.5em;
             margin-bottom: 30px;
-        }}
+        }
         
-        .nav-back a {{
+        .nav-back a {
             color: white;
             text-decoration: none;
             background: rgba(255,255,255,0.2);
             padding: 15px 30px;
             border-radius: 25px;
             transition: background 0.3s;
-        }}
+        }
         
-        .nav-back a:hover {{
+        .nav-back a:hover {
             background: rgba(255,255,255,0.3);
-        }}
+        }
     </style>
 </head>
 <body>
@@ -740,19 +748,15 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
     </div>
 </body>
 </html>
-        """
-    
-    def generate_error_html(self, code, message):
-        """Generate error page HTML"""
-        return f"""
-<!DOCTYPE html>
+""",
+    'error': """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{code} - {message}</title>
+    <title>$code - $message</title>
     <style>
-        body {{
+        body {
             font-family: Arial, sans-serif;
             background: linear-gradient(135deg, #ff4757, #c44569);
             color: white;
@@ -762,75 +766,955 @@ class CustomResponseHandler(BaseHTTPRequestHandler):
             align-items: center;
             justify-content: center;
             min-height: 100vh;
-        }}
+        }
         
-        .error-container {{
+        .error-container {
             text-align: center;
             background: rgba(0,0,0,0.3);
             padding: 40px;
             border-radius: 15px;
             backdrop-filter: blur(10px);
-        }}
+        }
         
-        .error-code {{
+        .error-code {
             font-size: 4em;
             font-weight: bold;
             margin-bottom: 20px;
-        }}
+        }
         
-        .error-message {{
+        .error-message {
             font-size: 1.5em;
             margin-bottom: 30px;
-        }}
+        }
     </style>
 </head>
 <body>
     <div class="error-container">
-        <div class="error-code">{code}</div>
-        <div class="error-message">{message}</div>
+        <div class="error-code">$code</div>
+        <div class="error-message">$message</div>
         <p>Please try again later or contact the administrator.</p>
     </div>
 </body>
 </html>
-        """
+"""
+}
+
+def inotify_watch(directories):
+    """Return a non-blocking inotify descriptor watching directories, or None"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        for directory in directories:
+            if libc.inotify_add_watch(fd, directory.encode(), INOTIFY_MASK) < 0:
+                os.close(fd)
+                return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+        
+class TemplateStore:
+    """Branding templates and settings, reloaded from disk when they change
+    
+    Templates are compiled once and swapped in as a whole on the engine's
+    event loop, then the response cache is invalidated; open connections
+    simply get the new pages on their next request.
+    """
+    
+    def __init__(self, template_dir=TEMPLATE_DIR, branding_file=BRANDING_FILE):
+        self.template_dir = template_dir
+        self.branding_file = branding_file
+        self.state = ({name: Template(text) for name, text in DEFAULT_TEMPLATES.items()}, {})
+        self.mtimes = {}
+        self.reload_count = 0
+        self.loop = None
+        self.inotify_fd = None
+        self.timer = None
+        self.load()
+        
+    @property
+    def settings(self):
+        return self.state[1]
+        
+    def template_path(self, name):
+        return os.path.join(self.template_dir, f'{name}.html')
+        
+    def get_mtimes(self):
+        """Modification times of every file that feeds the templates"""
+        mtimes = {}
+        for path in [self.template_path(name) for name in DEFAULT_TEMPLATES] + [self.branding_file]:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+        
+    def load(self):
+        """Read template files and branding settings, then swap them in"""
+        previous_templates, previous_settings = self.state
+        mtimes = self.get_mtimes()
+        templates = {}
+        for name, text in DEFAULT_TEMPLATES.items():
+            path = self.template_path(name)
+            if mtimes[path] is None:
+                templates[name] = Template(text)
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    template = Template(f.read())
+                if not template.is_valid():
+                    raise ValueError("invalid $ placeholder")
+                templates[name] = template
+            except (OSError, UnicodeDecodeError, ValueError) as e:
+                logger.error(f"Keeping previous {name} template, failed to load {path}: {e}")
+                templates[name] = previous_templates[name]
+                
+        settings = {
+            'response_msg': RESPONSE_MSG,
+            'server_name': SERVER_NAME,
+            'admin_email': ADMIN_EMAIL
+        }
+        if mtimes[self.branding_file] is not None:
+            try:
+                with open(self.branding_file, encoding='utf-8') as f:
+                    for line in f:
+                        key, _, value = line.strip().partition('=')
+                        if key in ('RESPONSE_MSG', 'SERVER_NAME', 'ADMIN_EMAIL'):
+                            settings[key.lower()] = value.strip().strip('"\'')
+            except (OSError, UnicodeDecodeError) as e:
+                logger.error(f"Keeping previous branding settings, failed to read {self.branding_file}: {e}")
+                settings = previous_settings
+                
+        self.state = (templates, settings)
+        self.mtimes = mtimes
+        
+    def render(self, name, **values):
+        """Render a template with the branding settings and page values"""
+        templates, settings = self.state
+        return templates[name].safe_substitute(settings, **values)
+        
+    def reload_if_changed(self, force=False):
+        """Reload and drop cached pages if any source file changed"""
+        self.timer = None
+        if not force and self.get_mtimes() == self.mtimes:
+            return False
+        self.load()
+        self.reload_count += 1
+        response_cache.invalidate()
+        logger.info(f"Branding templates reloaded (reload #{self.reload_count})")
+        return True
+        
+    def watch(self, loop):
+        """Watch template sources from an event loop, using inotify when available"""
+        self.loop = loop
+        directories = {self.template_dir, os.path.dirname(self.branding_file)}
+        self.inotify_fd = inotify_watch(directories)
+        if self.inotify_fd is not None:
+            loop.add_reader(self.inotify_fd, self.on_inotify)
+            logger.info(f"Watching branding templates with inotify in {', '.join(sorted(directories))}")
+        else:
+            self.timer = loop.call_later(TEMPLATE_POLL_INTERVAL, self.poll)
+            logger.info(f"Polling branding templates every {TEMPLATE_POLL_INTERVAL}s")
+            
+    def on_inotify(self):
+        """Drain inotify events and schedule a reload"""
+        try:
+            while os.read(self.inotify_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        # Editors and sed -i write in several steps; settle briefly before re-reading
+        if self.timer is None:
+            self.timer = self.loop.call_later(0.2, self.reload_if_changed)
+            
+    def poll(self):
+        """mtime polling fallback when inotify is unavailable"""
+        self.reload_if_changed()
+        self.timer = self.loop.call_later(TEMPLATE_POLL_INTERVAL, self.poll)
+        
+    def unwatch(self):
+        """Stop watching; runs on the event loop"""
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if self.inotify_fd is not None:
+            self.loop.remove_reader(self.inotify_fd)
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+            
+    def export(self, directory):
+        """Write the built-in templates to directory as editable starting points"""
+        os.makedirs(directory, exist_ok=True)
+        written = []
+        for name, text in DEFAULT_TEMPLATES.items():
+            path = os.path.join(directory, f'{name}.html')
+            if not os.path.exists(path):
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                written.append(path)
+        return written
+        
+templates = TemplateStore()
+
+class StaticFile:
+    """Cached metadata for one file under STATIC_DIR"""
+    
+    def __init__(self, path, stat_result):
+        self.path = path
+        self.size = stat_result.st_size
+        self.mtime = stat_result.st_mtime
+        self.etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        self.checked = time.monotonic()
+        
+class StaticFiles:
+    """Resolve /static/ URLs to files under STATIC_DIR with cached stat data"""
+    
+    def __init__(self, root=STATIC_DIR, ttl=STATIC_STAT_TTL):
+        self.root = os.path.realpath(root)
+        self.ttl = ttl
+        self.entries = {}
+        
+    def resolve(self, url_path):
+        """Map a URL path to a real path inside root, or None if it escapes"""
+        relative = unquote(url_path[len(STATIC_PREFIX):])
+        if not relative or '\x00' in relative:
+            return None
+        path = os.path.realpath(os.path.join(self.root, relative))
+        if not path.startswith(self.root + os.sep):
+            return None
+        return path
+        
+    def lookup(self, url_path):
+        """Return StaticFile metadata for a URL path, or None if not servable"""
+        entry = self.entries.get(url_path)
+        if entry is not None and time.monotonic() - entry.checked < self.ttl:
+            return entry
+            
+        path = self.resolve(url_path)
+        if path is None:
+            return None
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            self.entries.pop(url_path, None)
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+            
+        if len(self.entries) >= STATIC_CACHE_ENTRIES:
+            self.entries.clear()
+        entry = self.entries[url_path] = StaticFile(path, stat_result)
+        return entry
+        
+static_files = StaticFiles()
+
+def parse_range(header, size):
+    """Parse a single-range Range header into (start, end) inclusive
+    
+    Returns None to serve the whole file (absent, malformed or multi-range)
+    and raises ValueError when the range cannot be satisfied.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[6:].strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError(f"unsatisfiable range {header}")
+    return start, end
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with percentile estimates"""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        
+    def record(self, seconds):
+        """Add one observation"""
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+            
+    def percentile(self, fraction, counts=None):
+        """Upper bound of the bucket holding the given fraction of observations"""
+        counts = counts or self.counts
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = fraction * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+        
+    def snapshot(self):
+        """Summary in milliseconds"""
+        counts = list(self.counts)
+        count = sum(counts)
+        return {
+            'count': count,
+            'avg_ms': round(self.total / count * 1000, 3) if count else 0.0,
+            'max_ms': round(self.max * 1000, 3),
+            'p50_ms': round(self.percentile(0.50, counts) * 1000, 3),
+            'p95_ms': round(self.percentile(0.95, counts) * 1000, 3),
+            'p99_ms': round(self.percentile(0.99, counts) * 1000, 3)
+        }
+        
+class RequestMetrics:
+    """Request counters by route and status plus per-route latency histograms
+    
+    Only the engine's event loop thread writes these, so increments need no
+    lock; readers on other threads take copies in snapshot().
+    """
+    
+    def __init__(self):
+        self.requests = 0
+        self.routes = {}
+        self.statuses = {}
+        self.latency = LatencyHistogram()
+        self.route_latency = {}
+        
+    def record(self, path, status, seconds):
+        """Count one request and its handling time"""
+        if path in METRIC_ROUTES:
+            route = path
+        else:
+            route = '/static' if path.startswith(STATIC_PREFIX) else 'other'
+        self.requests += 1
+        self.routes[route] = self.routes.get(route, 0) + 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latency.record(seconds)
+        histogram = self.route_latency.get(route)
+        if histogram is None:
+            histogram = self.route_latency[route] = LatencyHistogram()
+        histogram.record(seconds)
+        
+    def snapshot(self):
+        """Copy of the counters and latency summaries"""
+        return {
+            'requests': self.requests,
+            'routes': dict(self.routes),
+            'statuses': {str(status): count for status, count in dict(self.statuses).items()},
+            'latency': self.latency.snapshot(),
+            'route_latency': {route: histogram.snapshot() for route, histogram in dict(self.route_latency).items()}
+        }
+        
+class HTTPRequestError(Exception):
+    """Malformed or abusive request; answered with the given status before closing
+    
+    reason names the read guard counter to bump, if any.
+    """
+    
+    def __init__(self, code, message, reason=None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.reason = reason
+        
+class HTTPRequest:
+    """A parsed HTTP/1.x request"""
+    
+    def __init__(self, command='GET', path='/', version='HTTP/1.0', headers=None, body=b''):
+        self.command = command
+        self.path = path
+        self.version = version
+        self.headers = headers if headers is not None else parse_headers(io.BytesIO(b'\r\n'))
+        self.body = body
+        
+    @property
+    def requestline(self):
+        return f'{self.command} {self.path} {self.version}'
+        
+    def keep_alive(self):
+        """Check whether the client wants the connection kept open"""
+        connection = self.headers.get('Connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return 'keep-alive' in connection
+        return 'close' not in connection
+        
+class IdleTimeout(Exception):
+    """No request started within the idle timeout; the connection is closed quietly"""
+    
+async def read_before(read, deadline, phase):
+    """Await a stream read that must finish by an absolute loop deadline"""
+    remaining = deadline - asyncio.get_running_loop().time()
+    try:
+        if remaining <= 0:
+            read.close()  # never awaited, so discard it without a warning
+            raise asyncio.TimeoutError
+        return await asyncio.wait_for(read, remaining)
+    except asyncio.TimeoutError:
+        raise HTTPRequestError(408, 'Request Timeout', f'{phase}_timeouts')
+    except (ValueError, asyncio.LimitOverrunError):
+        # The line exceeded the stream limit (MAX_HEADER_BYTES)
+        raise HTTPRequestError(431, 'Request Header Fields Too Large', 'oversized_headers')
+        
+async def read_request(reader, idle_timeout=KEEPALIVE_TIMEOUT):
+    """Read one request from a stream; None when the client closed cleanly
+    
+    The wait for the first byte is bounded by idle_timeout; after that the
+    request line, the header block and the body each get an absolute
+    deadline, so dribbling bytes cannot hold a connection open.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        first = await asyncio.wait_for(reader.read(1), idle_timeout)
+    except asyncio.TimeoutError:
+        raise IdleTimeout()
+    if not first:
+        return None
+        
+    line = first + await read_before(reader.readline(), loop.time() + REQUEST_LINE_TIMEOUT, 'request_line')
+    if line in (b'\r\n', b'\n'):
+        # Tolerate a stray CRLF between pipelined requests
+        line = await read_before(reader.readline(), loop.time() + REQUEST_LINE_TIMEOUT, 'request_line')
+    if not line:
+        return None
+        
+    parts = line.decode('iso-8859-1').split()
+    if len(parts) != 3:
+        raise HTTPRequestError(400, 'Bad request syntax')
+    command, path, version = parts
+    if not version.startswith('HTTP/1.'):
+        raise HTTPRequestError(505, 'HTTP Version Not Supported')
+        
+    deadline = loop.time() + HEADER_TIMEOUT
+    header_lines = []
+    header_bytes = 0
+    while True:
+        header_line = await read_before(reader.readline(), deadline, 'header')
+        if header_line in (b'\r\n', b'\n', b''):
+            break
+        header_lines.append(header_line)
+        header_bytes += len(header_line)
+        if len(header_lines) > MAX_HEADERS:
+            raise HTTPRequestError(431, 'Too Many Header Fields', 'too_many_headers')
+        if header_bytes > MAX_HEADER_BYTES:
+            raise HTTPRequestError(431, 'Request Header Fields Too Large', 'oversized_headers')
+    headers = parse_headers(io.BytesIO(b''.join(header_lines) + b'\r\n'))
+    
+    body = b''
+    if 'Transfer-Encoding' in headers:
+        raise HTTPRequestError(411, 'Length Required')
+    length = headers.get('Content-Length')
+    if length:
+        try:
+            length = int(length)
+        except ValueError:
+            raise HTTPRequestError(400, 'Bad Content-Length')
+        if length < 0 or length > MAX_REQUEST_BODY:
+            raise HTTPRequestError(413, 'Payload Too Large')
+        body = await read_before(reader.readexactly(length), loop.time() + BODY_TIMEOUT, 'body')
+        
+    return HTTPRequest(command, path, version, headers, body)
+    
+_date_cache = [0, '']
+
+def http_date():
+    """Current Date header value, formatted at most once per second"""
+    now = int(time.time())
+    if _date_cache[0] != now:
+        _date_cache[0] = now
+        _date_cache[1] = formatdate(now, usegmt=True)
+    return _date_cache[1]
+    
+class CustomResponseHandler:
+    """Custom HTTP response handler with branding
+    
+    Each instance renders one request into a response buffer; the engine
+    owns the connection, so rendering never waits on a slow client.
+    """
+    
+    def __init__(self, server, request, last_request=False):
+        self.server = server
+        self.request = request
+        self.command = request.command
+        self.path = request.path
+        self.headers = request.headers
+        self.close_connection = last_request or not request.keep_alive()
+        self.status = None
+        self.buffer = []
+        self.sendfile = None
+        
+    def handle_one_request(self):
+        """Dispatch to the do_* method and return the encoded response"""
+        method = getattr(self, f'do_{self.command}', None)
+        if method is None:
+            self.serve_error_page(501, f"Unsupported method ({self.command})")
+        else:
+            method()
+        self.log_message('"%s" %s -', self.request.requestline, self.status)
+        return b''.join(self.buffer)
+        
+    def send_response(self, code, message=None):
+        """Send the status line plus connection management headers"""
+        if message is None:
+            try:
+                message = HTTPStatus(code).phrase
+            except ValueError:
+                message = ''
+        self.status = code
+        self.buffer.append(f'HTTP/1.1 {code} {message}\r\n'.encode('latin-1'))
+        self.send_header('Date', http_date())
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        else:
+            if self.request.version == 'HTTP/1.0':
+                self.send_header('Connection', 'keep-alive')
+            self.send_header('Keep-Alive', f'timeout={KEEPALIVE_TIMEOUT}, max={KEEPALIVE_MAX_REQUESTS}')
+            
+    def send_header(self, keyword, value):
+        """Append one header line"""
+        self.buffer.append(f'{keyword}: {value}\r\n'.encode('latin-1'))
+        
+    def end_headers(self):
+        """Terminate the header block"""
+        self.buffer.append(b'\r\n')
+        
+    def do_GET(self):
+        """Handle GET requests"""
+        try:
+            path = self.path
+            port = self.server.server_port
+            
+            # Parse query parameters
+            parsed_url = urlparse(path)
+            query_params = parse_qs(parsed_url.query)
+            
+            # Route based on path
+            if parsed_url.path == '/':
+                self.serve_main_page(port)
+            elif parsed_url.path == '/status':
+                self.serve_status_page(port)
+            elif parsed_url.path == '/info':
+                self.serve_info_page(port)
+            elif parsed_url.path == '/api/status':
+                self.serve_api_status(port)
+            elif parsed_url.path == '/config':
+                self.serve_config_page(port)
+            elif parsed_url.path.startswith(STATIC_PREFIX):
+                self.serve_static(parsed_url.path)
+            else:
+                self.serve_404_page()
+                
+        except Exception as e:
+            logger.error(f"Error handling GET request: {e}")
+            self.serve_error_page(500, "Internal Server Error")
+    
+    def do_HEAD(self):
+        """Handle HEAD requests; bodies are suppressed in send_body"""
+        self.do_GET()
+    
+    def do_POST(self):
+        """Handle POST requests"""
+        try:
+            post_data = self.request.body
+            
+            # Simple echo for POST requests
+            response = {
+                'status': 'success',
+                'message': 'POST request received',
+                'port': self.server.server_port,
+                'timestamp': time.time(),
+                'data_received': len(post_data)
+            }
+            
+            body = json.dumps(response, indent=2).encode('utf-8')
+            self.send_page(200, 'application/json', body, self.server.server_port)
+            
+        except Exception as e:
+            logger.error(f"Error handling POST request: {e}")
+            self.serve_error_page(500, "Internal Server Error")
+    
+    def send_cached(self, entry):
+        """Send a cached response variant, answering If-None-Match with 304"""
+        body, etag, headers = entry.select(self.headers.get('Accept-Encoding'))
+        
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            if etag in tags or '*' in tags:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Server', f'Mastermind-Response/{self.server.server_port}')
+                if len(entry.variants) > 1:
+                    self.send_header('Vary', 'Accept-Encoding')
+                self.end_headers()
+                return
+                
+        self.send_response(entry.status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.send_body(body)
+        
+    def send_body(self, body):
+        """Write a response body unless this is a HEAD request"""
+        if self.command != 'HEAD':
+            self.buffer.append(body)
+            
+    def send_page(self, status, content_type, body, port):
+        """Send a dynamically rendered response"""
+        self.send_response(status)
+        self.send_header('Content-type', content_type)
+        self.send_header('Server', f'Mastermind-Response/{port}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.send_body(body)
+        
+    def serve_main_page(self, port):
+        """Serve the main branded page"""
+        entry = response_cache.get(port, '/', lambda: CachedResponse(
+            200, 'text/html; charset=utf-8', self.generate_main_html(port).encode('utf-8'), port
+        ))
+        self.send_cached(entry)
+    
+    def serve_status_page(self, port):
+        """Serve status page, re-rendered at most every STATUS_CACHE_TTL seconds"""
+        entry = response_cache.get(port, '/status', lambda: CachedResponse(
+            200, 'text/html; charset=utf-8', self.generate_status_html(port).encode('utf-8'), port,
+            ttl=STATUS_CACHE_TTL
+        ))
+        self.send_cached(entry)
+    
+    def serve_info_page(self, port):
+        """Serve info page"""
+        entry = response_cache.get(port, '/info', lambda: CachedResponse(
+            200, 'text/html; charset=utf-8', self.generate_info_html(port).encode('utf-8'), port
+        ))
+        self.send_cached(entry)
+    
+    def serve_api_status(self, port):
+        """Serve aggregated JSON status for every port, rebuilt at most every STATUS_CACHE_TTL seconds"""
+        entry = response_cache.get(port, '/api/status', lambda: CachedResponse(
+            200, 'application/json', json.dumps(self.generate_api_status(port), indent=2).encode('utf-8'),
+            port, ttl=STATUS_CACHE_TTL, extra_headers=[('Access-Control-Allow-Origin', '*')]
+        ))
+        self.send_cached(entry)
+        
+    def generate_api_status(self, port):
+        """Build the status document from in-memory counters"""
+        ports = self.server.engine.get_status() if self.server.engine else {}
+        return {
+            'status': 'online',
+            'server': templates.settings['server_name'],
+            'port': port,
+            'service': 'Mastermind Response Server',
+            'version': '1.0.0',
+            'timestamp': time.time(),
+            'uptime': time.time() - self.server.start_time,
+            'requests_served': getattr(self.server, 'request_count', 0),
+            'metrics': self.server.metrics.snapshot(),
+            'totals': {
+                'ports': len(ports),
+                'requests_served': sum(status['requests_served'] for status in ports.values()),
+                'active_connections': sum(status['active_connections'] for status in ports.values())
+            },
+            'ports': ports,
+            'cache': {'hits': response_cache.hits, 'misses': response_cache.misses}
+        }
+    
+    def serve_config_page(self, port):
+        """Serve configuration page, re-rendered at most every STATUS_CACHE_TTL seconds"""
+        entry = response_cache.get(port, '/config', lambda: CachedResponse(
+            200, 'text/html; charset=utf-8', self.generate_config_html(port).encode('utf-8'), port,
+            ttl=STATUS_CACHE_TTL
+        ))
+        self.send_cached(entry)
+    
+    def serve_static(self, url_path):
+        """Serve a file from STATIC_DIR; the engine streams the body with sendfile"""
+        entry = static_files.lookup(url_path)
+        if entry is None:
+            self.serve_404_page()
+            return
+            
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match and entry.etag in [tag.strip() for tag in if_none_match.split(',')]:
+            self.send_response(304)
+            self.send_header('ETag', entry.etag)
+            self.end_headers()
+            return
+            
+        range_header = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if if_range and if_range != entry.etag:
+            range_header = None
+        try:
+            byte_range = parse_range(range_header, entry.size)
+        except ValueError:
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{entry.size}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+            
+        start, end = byte_range if byte_range else (0, entry.size - 1)
+        self.send_response(206 if byte_range else 200)
+        self.send_header('Content-type', entry.content_type)
+        self.send_header('Server', f'Mastermind-Response/{self.server.server_port}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('ETag', entry.etag)
+        self.send_header('Last-Modified', entry.last_modified)
+        self.send_header('Accept-Ranges', 'bytes')
+        if byte_range:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{entry.size}')
+        self.end_headers()
+        if self.command != 'HEAD' and entry.size:
+            self.sendfile = (entry.path, start, end - start + 1)
+            
+    def serve_404_page(self):
+        """Serve 404 page"""
+        port = self.server.server_port
+        entry = response_cache.get(port, None, lambda: CachedResponse(
+            404, 'text/html; charset=utf-8', self.generate_404_html().encode('utf-8'), port
+        ))
+        self.send_cached(entry)
+    
+    def serve_error_page(self, code, message):
+        """Serve error page"""
+        html = self.generate_error_html(code, message)
+        self.send_page(code, 'text/html; charset=utf-8', html.encode('utf-8'), self.server.server_port)
+    
+    def generate_main_html(self, port):
+        """Generate main page HTML"""
+        return templates.render('main', port=port, generated=time.strftime('%Y-%m-%d %H:%M:%S %Z'))
+    
+    def generate_status_html(self, port):
+        """Generate status page HTML"""
+        uptime = time.time() - getattr(self.server, 'start_time', time.time())
+        uptime_str = f"{int(uptime // 3600):02d}:{int((uptime % 3600) // 60):02d}:{int(uptime % 60):02d}"
+        return templates.render('status', port=port, uptime=uptime_str,
+                                requests_served=getattr(self.server, 'request_count', 0))
+    
+    def generate_info_html(self, port):
+        """Generate info page HTML"""
+        return templates.render('info', port=port)
+    
+    def generate_config_html(self, port):
+        """Generate configuration page HTML"""
+        return templates.render('config', port=port, log_level=LOG_LEVEL,
+                                start_time=getattr(self.server, 'start_time', time.time()),
+                                requests_served=getattr(self.server, 'request_count', 0))
+    
+    def generate_404_html(self):
+        """Generate 404 page HTML"""
+        return templates.render('404')
+    
+    def generate_error_html(self, code, message):
+        """Generate error page HTML; message may echo request data, so it is escaped"""
+        return templates.render('error', code=code, message=escape(message))
     
     def log_message(self, format, *args):
         """Override log message to use our logger"""
         logger.info(f"HTTP {self.server.server_port}: {format % args}")
-        
-        # Increment request counter
-        if hasattr(self.server, 'request_count'):
-            self.server.request_count += 1
-        else:
-            self.server.request_count = 1
 
-class MastermindHTTPServer(HTTPServer):
-    """Custom HTTP server with additional functionality"""
+class ResponsePort:
+    """Listener state for one port served by the HTTP engine"""
     
-    def __init__(self, server_address, RequestHandlerClass):
-        super().__init__(server_address, RequestHandlerClass)
+    def __init__(self, port, concurrency=PORT_CONCURRENCY, engine=None):
+        self.server_port = port
+        self.engine = engine
         self.start_time = time.time()
-        self.request_count = 0
+        self.metrics = RequestMetrics()
+        self.guard = dict.fromkeys(GUARD_COUNTERS, 0)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.connections = set()
+        self.server = None
+        
+    @property
+    def request_count(self):
+        return self.metrics.requests
+        
+class AsyncHTTPEngine:
+    """Serve every response port from one asyncio event loop
+    
+    Requests on a port run concurrently up to PORT_CONCURRENCY, so a slow
+    client only holds its own slot; adding a port adds a listener, not a thread.
+    """
+    
+    def __init__(self, handler_class=CustomResponseHandler):
+        self.handler_class = handler_class
+        self.ports = {}
+        self.loop = None
+        self.thread = None
+        
+    def start(self):
+        """Start the event loop thread"""
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='response-engine')
+        self.thread.daemon = True
+        self.thread.start()
+        
+    def stop(self):
+        """Close every port and stop the event loop"""
+        if self.loop is None:
+            return
+        for port in list(self.ports):
+            self.run(self.remove_port(port))
+        try:
+            self.run(self.finish_tasks())
+        except Exception as e:
+            logger.error(f"Error finishing connection tasks: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        self.loop.close()
+        self.loop = None
+        
+    async def finish_tasks(self, timeout=2):
+        """Let closed connections unwind, then cancel whatever is still pending"""
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        
+    def run(self, coroutine, timeout=10):
+        """Run a coroutine on the engine loop from another thread"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+        
+    async def add_port(self, port):
+        """Bind a listener for port on the engine loop"""
+        state = ResponsePort(port, engine=self)
+        state.server = await asyncio.start_server(
+            partial(self.handle_connection, state), '0.0.0.0', port,
+            reuse_address=True, limit=MAX_HEADER_BYTES
+        )
+        self.ports[port] = state
+        return state
+        
+    async def remove_port(self, port):
+        """Close a listener and its open connections"""
+        state = self.ports.pop(port, None)
+        if state is None:
+            return
+        state.server.close()
+        for writer in list(state.connections):
+            writer.close()
+        await state.server.wait_closed()
+        
+    async def handle_connection(self, state, reader, writer):
+        """Serve keep-alive requests on one connection"""
+        if len(state.connections) >= PORT_MAX_CONNECTIONS:
+            writer.write(self.error_response(state, 503, 'Too many connections'))
+            writer.close()
+            return
+            
+        state.connections.add(writer)
+        handled = 0
+        try:
+            while handled < KEEPALIVE_MAX_REQUESTS:
+                try:
+                    # A new connection must start its request promptly; keep-alive may idle longer
+                    idle_timeout = KEEPALIVE_TIMEOUT if handled else min(KEEPALIVE_TIMEOUT, REQUEST_LINE_TIMEOUT)
+                    request = await read_request(reader, idle_timeout)
+                except IdleTimeout:
+                    if not handled:
+                        state.guard['idle_timeouts'] += 1
+                    break
+                except HTTPRequestError as e:
+                    if e.reason:
+                        state.guard[e.reason] += 1
+                    writer.write(self.error_response(state, e.code, e.message))
+                    await asyncio.wait_for(writer.drain(), WRITE_TIMEOUT)
+                    break
+                if request is None:
+                    break
+                    
+                handled += 1
+                started = time.perf_counter()
+                async with state.semaphore:
+                    handler = self.handler_class(state, request, handled >= KEEPALIVE_MAX_REQUESTS)
+                    response = handler.handle_one_request()
+                    state.metrics.record(urlparse(request.path).path, handler.status,
+                                         time.perf_counter() - started)
+                # Flush outside the slot so a client that stops reading cannot hold it
+                writer.write(response)
+                await asyncio.wait_for(writer.drain(), WRITE_TIMEOUT)
+                if handler.sendfile:
+                    await self.send_file(writer, *handler.sendfile)
+                if handler.close_connection:
+                    break
+                    
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except Exception as e:
+            if not writer.is_closing():
+                logger.error(f"Error serving connection on port {state.server_port}: {e}")
+        finally:
+            state.connections.discard(writer)
+            writer.close()
+            
+    async def send_file(self, writer, path, offset, count):
+        """Stream part of a file with loop.sendfile (os.sendfile on plain TCP)
+        
+        Runs outside the port semaphore; STATIC_SEND_TIMEOUT bounds how long a
+        slow or stalled downloader keeps the connection, which is then closed.
+        """
+        with open(path, 'rb') as f:
+            sent = await asyncio.wait_for(
+                asyncio.get_running_loop().sendfile(writer.transport, f, offset, count),
+                STATIC_SEND_TIMEOUT
+            )
+        if sent != count:
+            # The file shrank after its metadata was cached; the framing is broken
+            raise ConnectionError(f"short sendfile for {path}: {sent} of {count} bytes")
+            
+    def get_status(self):
+        """Per-port listener state and request metrics"""
+        status = {}
+        for port, state in list(self.ports.items()):
+            status[port] = {
+                'running': True,
+                'start_time': state.start_time,
+                'requests_served': state.request_count,
+                'active_connections': len(state.connections),
+                'uptime': time.time() - state.start_time,
+                'metrics': state.metrics.snapshot(),
+                'read_guard': dict(state.guard)
+            }
+        return status
+        
+    def error_response(self, state, code, message):
+        """Render an error page for a request that could not be parsed"""
+        handler = self.handler_class(state, HTTPRequest(), last_request=True)
+        handler.serve_error_page(code, message)
+        return b''.join(handler.buffer)
 
 class ResponseServerManager:
     """Manager for multiple response servers"""
     
     def __init__(self):
-        self.servers = {}
-        self.threads = {}
+        self.engine = AsyncHTTPEngine()
+        self.servers = self.engine.ports
         self.running = False
         
     def start_server(self, port):
         """Start a response server on specified port"""
         try:
-            server = MastermindHTTPServer(('0.0.0.0', port), CustomResponseHandler)
-            self.servers[port] = server
-            
-            thread = threading.Thread(target=server.serve_forever)
-            thread.daemon = True
-            thread.start()
-            self.threads[port] = thread
-            
+            self.engine.start()
+            self.engine.run(self.engine.add_port(port))
             logger.info(f"Response server started on port {port}")
             return True
             
@@ -841,13 +1725,7 @@ class ResponseServerManager:
     def stop_server(self, port):
         """Stop a response server on specified port"""
         if port in self.servers:
-            self.servers[port].shutdown()
-            self.servers[port].server_close()
-            del self.servers[port]
-            
-            if port in self.threads:
-                del self.threads[port]
-                
+            self.engine.run(self.engine.remove_port(port))
             logger.info(f"Response server stopped on port {port}")
     
     def start_all(self):
@@ -857,6 +1735,7 @@ class ResponseServerManager:
         
         for port in RESPONSE_PORTS:
             self.start_server(port)
+        self.engine.loop.call_soon_threadsafe(templates.watch, self.engine.loop)
             
         logger.info(f"Started {len(self.servers)} response servers")
     
@@ -867,20 +1746,20 @@ class ResponseServerManager:
         
         for port in list(self.servers.keys()):
             self.stop_server(port)
+        if self.engine.loop:
+            self.engine.loop.call_soon_threadsafe(templates.unwatch)
+        self.engine.stop()
             
         logger.info("All response servers stopped")
     
+    def reload_templates(self):
+        """Force a template reload on the engine loop"""
+        if self.engine.loop:
+            self.engine.loop.call_soon_threadsafe(templates.reload_if_changed, True)
+            
     def get_status(self):
         """Get status of all servers"""
-        status = {}
-        for port, server in self.servers.items():
-            status[port] = {
-                'running': True,
-                'start_time': server.start_time,
-                'requests_served': server.request_count,
-                'uptime': time.time() - server.start_time
-            }
-        return status
+        return self.engine.get_status()
 
 def signal_handler(signum, frame):
     """Handle shutdown signals"""
@@ -888,16 +1767,28 @@ def signal_handler(signum, frame):
     manager.stop_all()
     sys.exit(0)
 
+def reload_handler(signum, frame):
+    """Reload branding templates on SIGHUP"""
+    logger.info("Received SIGHUP, reloading branding templates...")
+    manager.reload_templates()
+
 def main():
     """Main function"""
     global manager
     
+    if len(sys.argv) > 1 and sys.argv[1] == 'export-templates':
+        directory = sys.argv[2] if len(sys.argv) > 2 else TEMPLATE_DIR
+        for path in templates.export(directory):
+            print(path)
+        return
+    
     # Create server manager
     manager = ResponseServerManager()
     
     # Setup signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
+    signal.signal(signal.SIGHUP, reload_handler)
     
     try:
         # Start all servers
@@ -311,7 +311,31 @@ Environment=HTTP_PROXY_PORT=8888
 Environment=WEBSOCKET_PORT=444
 Environment=WEBSOCKET_PROXY_TARGET=8080
 Environment=LOG_LEVEL=INFO
+EnvironmentFile=-/etc/default/python-proxy
 ExecStart=/usr/bin/python3 /opt/mastermind/protocols/python_proxy.py
+ExecReload=/bin/kill -HUP $MAINPID
+Restart=always
+RestartSec=10
+StandardOutput=journal
+StandardError=journal
+
+[Install]
+WantedBy=multi-user.target
+EOF
+
+    # Usage limits daemon (CLI calls go through its socket when it runs)
+    cat > /etc/systemd/system/usage-limits.service << 'EOF'
+[Unit]
+Description=Mastermind Usage Limits Daemon
+After=network.target
+
+[Service]
+Type=simple
+User=root
+Group=root
+WorkingDirectory=/opt/mastermind/users
+Environment=USAGE_SOCKET=/run/mastermind/usage-limits.sock
+ExecStart=/usr/bin/python3 /opt/mastermind/users/usage_limits.py serve
 Restart=always
 RestartSec=10
 StandardOutput=journal
@@ -545,6 +569,8 @@ post_install_setup() {
     
     # Enable and start services
     systemctl enable python-proxy
+    # Start the daemon now so limit checks use its socket before the next reboot
+    systemctl enable --now usage-limits
     systemctl enable tcp-bypass
     
     # Generate initial configuration with error handling
@@ -570,12 +596,15 @@ cleanup_on_error() {
     
     # Stop and disable services if they exist
     systemctl stop python-proxy 2>/dev/null || true
+    systemctl stop usage-limits 2>/dev/null || true
     systemctl stop tcp-bypass 2>/dev/null || true
     systemctl disable python-proxy 2>/dev/null || true
+    systemctl disable usage-limits 2>/dev/null || true
     systemctl disable tcp-bypass 2>/dev/null || true
     
     # Remove service files
     rm -f /etc/systemd/system/python-proxy.service
+    rm -f /etc/systemd/system/usage-limits.service
     rm -f /etc/systemd/system/tcp-bypass.service
     
     # Remove installation directory
@@ -162,14 +162,16 @@ change_response_message() {
     
     if [ "$new_message" != "$RESPONSE_MSG" ]; then
         # Update configuration
-        sed -i "s/RESPONSE_MSG=.*/RESPONSE_MSG=\"$new_message\"/" /etc/default/python-proxy
+        if grep -q "^RESPONSE_MSG=" /etc/default/python-proxy 2>/dev/null; then
+            sed -i "s/RESPONSE_MSG=.*/RESPONSE_MSG=\"$new_message\"/" /etc/default/python-proxy
+        else
+            echo "RESPONSE_MSG=\"$new_message\"" >> /etc/default/python-proxy
+        fi
         sed -i "s/BRAND_MESSAGE=.*/BRAND_MESSAGE=\"$new_message\"/" /opt/mastermind/core/config.cfg
         
+        # python-proxy re-reads RESPONSE_MSG on SIGHUP (and polls the file), so tunnels stay up
+        systemctl reload python-proxy 2>/dev/null || true
         log_info "Response message updated"
-        
-        if confirm "Restart proxy service to apply changes?"; then
-            systemctl restart python-proxy
-        fi
     fi
     
     wait_for_key
@@ -445,8 +447,52 @@ configure_ssl_tls() {
     echo
     echo -e "${YELLOW}SSL/TLS Configuration${NC}"
     echo
-    echo -e "${YELLOW}This feature is coming soon...${NC}"
-    echo
+    
+    local cert_file key_file
+    cert_file=$(get_input "Certificate file" "" "/etc/mastermind/ssl/server.crt")
+    key_file=$(get_input "Private key file" "" "/etc/mastermind/ssl/server.key")
+    
+    if [ ! -f "$cert_file" ] || [ ! -f "$key_file" ]; then
+        if confirm "Certificate not found. Generate a self-signed certificate?"; then
+            mkdir -p "$(dirname "$cert_file")" "$(dirname "$key_file")"
+            openssl req -x509 -newkey rsa:2048 -nodes -days 365 \
+                -keyout "$key_file" -out "$cert_file" \
+                -subj "/CN=$(hostname)" 2>/dev/null
+            chmod 600 "$key_file"
+            chmod 644 "$cert_file"
+            log_info "Self-signed certificate generated"
+        else
+            wait_for_key
+            return
+        fi
+    fi
+    
+    local tls_websocket=false tls_socks=false
+    confirm "Enable TLS on the WebSocket port?" && tls_websocket=true
+    confirm "Enable TLS on the SOCKS5 port?" && tls_socks=true
+    
+    # Update configuration, appending keys that are not present yet
+    local key value
+    for key in TLS_CERT_FILE TLS_KEY_FILE TLS_WEBSOCKET TLS_SOCKS; do
+        case $key in
+            TLS_CERT_FILE) value="$cert_file" ;;
+            TLS_KEY_FILE) value="$key_file" ;;
+            TLS_WEBSOCKET) value="$tls_websocket" ;;
+            TLS_SOCKS) value="$tls_socks" ;;
+        esac
+        if grep -q "^$key=" /etc/default/python-proxy; then
+            sed -i "s|^$key=.*|$key=$value|" /etc/default/python-proxy
+        else
+            echo "$key=$value" >> /etc/default/python-proxy
+        fi
+    done
+    
+    log_info "TLS configuration updated (certificate changes are picked up without restart)"
+    
+    if confirm "Restart proxy service to apply changes?"; then
+        systemctl restart python-proxy
+    fi
+    
     wait_for_key
 }
 
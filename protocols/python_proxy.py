@@ -18,14 +18,29 @@ import time
 import logging
 import signal
 import json
+import re
 import hashlib
+import io
 import base64
 import subprocess
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.client import parse_headers
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from email.utils import formatdate
 from urllib.parse import urlparse, parse_qs
 import websockets
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import CONT, CTRL_OPCODES
 import ssl
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Configuration - Fixed port structure to avoid conflicts
 SOCKS_PORT = int(os.getenv('SOCKS_PORT', '1080'))
 RESPONSE_PORTS = [int(p) for p in os.getenv('RESPONSE_PORTS', '9000,9001,9002,9003').split(',')]
@@ -35,6 +50,28 @@ HTTP_PROXY_PORT = int(os.getenv('HTTP_PROXY_PORT', '8888'))
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 ENABLE_WEBSOCKET = os.getenv('ENABLE_WEBSOCKET', 'true').lower() == 'true'
 ENABLE_HTTP_PROXY = os.getenv('ENABLE_HTTP_PROXY', 'true').lower() == 'true'
+EVENT_LOOP = os.getenv('EVENT_LOOP', 'auto').lower()  # auto, uvloop or asyncio
+KEEPALIVE_TIMEOUT = int(os.getenv('KEEPALIVE_TIMEOUT', '15'))  # idle seconds on response ports
+KEEPALIVE_MAX_REQUESTS = int(os.getenv('KEEPALIVE_MAX_REQUESTS', '100'))  # requests per connection
+RESPONSE_CONCURRENCY = int(os.getenv('RESPONSE_CONCURRENCY', '64'))  # requests in flight per response port
+RESPONSE_PORT_MODES = os.getenv('RESPONSE_PORT_MODES', '')  # e.g. "9000=banner,9003=banner+http"
+RESPONSE_MODES = ('http', 'banner', 'banner+http')
+STATUS_CACHE_TTL = float(os.getenv('STATUS_CACHE_TTL', '2'))  # seconds the /api/status document is reused
+BRANDING_FILE = os.getenv('BRANDING_FILE', '/etc/default/python-proxy')  # RESPONSE_MSG is re-read from here
+BRANDING_POLL_INTERVAL = float(os.getenv('BRANDING_POLL_INTERVAL', '2'))  # seconds between branding file checks
+
+# Slowloris protection for the response ports and the HTTP proxy
+REQUEST_LINE_TIMEOUT = float(os.getenv('REQUEST_LINE_TIMEOUT', '10'))  # first byte to end of request line
+HEADER_TIMEOUT = float(os.getenv('HEADER_TIMEOUT', '10'))  # whole header block
+BODY_TIMEOUT = float(os.getenv('BODY_TIMEOUT', '30'))  # whole request body
+WRITE_TIMEOUT = float(os.getenv('WRITE_TIMEOUT', '30'))  # flushing one response to a client that stopped reading
+MAX_HEADER_BYTES = int(os.getenv('MAX_HEADER_BYTES', '16384'))  # request line or header block size
+MAX_HEADERS = int(os.getenv('MAX_HEADERS', '64'))  # header lines per request
+GUARD_COUNTERS = ('idle_timeouts', 'request_line_timeouts', 'header_timeouts', 'body_timeouts',
+                  'oversized_headers', 'too_many_headers')
+
+# Latency histogram bucket upper bounds in seconds; slower requests land in an overflow bucket
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
 
 # SSH Configuration for WebSocket proxy
 SSH_HOST = os.getenv('SSH_HOST', 'localhost')
@@ -42,6 +79,33 @@ SSH_PORT = int(os.getenv('SSH_PORT', '22'))
 SSH_USER = os.getenv('SSH_USER', 'root')
 SSH_PASS = os.getenv('SSH_PASS', '')
 SSH_KEY_PATH = os.getenv('SSH_KEY_PATH', '')
+# Local ports leased to ssh -D tunnels; keep outside net.ipv4.ip_local_port_range
+SSH_FORWARD_PORTS = os.getenv('SSH_FORWARD_PORTS', '10000-10999')
+
+# WebSocket permessage-deflate configuration
+# Modes: off (no compression), deflate (always compress), adaptive (sample and bypass)
+WS_COMPRESSION = os.getenv('WS_COMPRESSION', 'adaptive').lower()
+WS_COMPRESSION_PATHS = os.getenv('WS_COMPRESSION_PATHS', '')  # e.g. "/ssh=off,/api=deflate"
+WS_COMPRESSION_LEVEL = int(os.getenv('WS_COMPRESSION_LEVEL', '6'))
+WS_COMPRESSION_SAMPLE = int(os.getenv('WS_COMPRESSION_SAMPLE', '32'))  # messages sampled per connection
+WS_COMPRESSION_MIN_SAVING = float(os.getenv('WS_COMPRESSION_MIN_SAVING', '0.1'))  # below this, bypass
+WS_COMPRESSION_MODES = ('off', 'deflate', 'adaptive')
+
+# WebSocket path routing: "path=backend[;option=value]" entries, comma separated
+# Backends: ssh (per-client ssh -D tunnel), ssh-shared (pooled ssh -D tunnel), tcp:host:port
+WS_ROUTES = os.getenv('WS_ROUTES', '')  # e.g. "/ssh=tcp:127.0.0.1:444,/openssh=tcp:127.0.0.1:22,/vless=tcp:127.0.0.1:10001"
+WS_DEFAULT_BACKEND = os.getenv('WS_DEFAULT_BACKEND', 'ssh')
+WS_SHARED_TUNNELS = int(os.getenv('WS_SHARED_TUNNELS', '1'))  # persistent ssh -D tunnels per ssh-shared route
+
+# TLS termination for the WebSocket and SOCKS5 listeners
+TLS_CERT_FILE = os.getenv('TLS_CERT_FILE', '/etc/mastermind/ssl/server.crt')
+TLS_KEY_FILE = os.getenv('TLS_KEY_FILE', '/etc/mastermind/ssl/server.key')
+TLS_WEBSOCKET = os.getenv('TLS_WEBSOCKET', 'false').lower() == 'true'
+TLS_SOCKS = os.getenv('TLS_SOCKS', 'false').lower() == 'true'
+TLS_RELOAD_INTERVAL = int(os.getenv('TLS_RELOAD_INTERVAL', '30'))  # seconds between certificate checks
+TLS_SESSION_TICKETS = int(os.getenv('TLS_SESSION_TICKETS', '2'))  # TLS 1.3 tickets issued per handshake
+TLS_HANDSHAKE_TIMEOUT = int(os.getenv('TLS_HANDSHAKE_TIMEOUT', '10'))
+TLS_KTLS = os.getenv('TLS_KTLS', 'false').lower() == 'true'
 
 # WebSocket to SSH SOCKS response templates
 RESPONSE_TEMPLATES = {
@@ -67,6 +131,15 @@ RESPONSE_TEMPLATES = {
     }
 }
 
+# Generate SSH-style server response like shown in NPV Tunnel
+# Updated for new port structure (9000-9003) - matches NPV Tunnel display
+PORT_RESPONSES = {
+    9000: 'SSH-2.0-dropbear_2020.81',
+    9001: '<div style="font-family: monospace; background-color: #000; color: #0f0; padding: 10px; text-align: center; border: 1px solid #0f0;"><strong style="font-size: 18px;">MasterMind\'s Server</strong><br>For support: Contact <span style="color: #00f;">@bitcockli</span> on Telegram<br><em style="color: #f00;">WARNING: Unauthorized access prohibited. All connections monitored.</em></div>',
+    9002: 'HTTP/1.1 101 <span style="color: #9fff;"><strong>MasterMind!!</strong></span>',
+    9003: 'SSH-2.0-OpenSSH_8.9p1 Ubuntu-3ubuntu0.1'
+}
+
 # Setup logging
 try:
     os.makedirs('/var/log/mastermind', exist_ok=True)
@@ -86,14 +159,204 @@ logging.basicConfig(
 )
 logger = logging.getLogger('MastermindProxy')
 
+class TLSStats:
+    """Handshake latency counters split by full and resumed handshakes"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {
+            'full': {'count': 0, 'total': 0.0, 'max': 0.0},
+            'resumed': {'count': 0, 'total': 0.0, 'max': 0.0}
+        }
+        self.failures = 0
+        
+    def record(self, duration, resumed):
+        """Record one completed handshake"""
+        with self.lock:
+            counter = self.counters['resumed' if resumed else 'full']
+            counter['count'] += 1
+            counter['total'] += duration
+            counter['max'] = max(counter['max'], duration)
+            
+    def record_failure(self):
+        """Record a failed handshake"""
+        with self.lock:
+            self.failures += 1
+            
+    def snapshot(self):
+        """Return handshake statistics in milliseconds"""
+        with self.lock:
+            stats = {'failures': self.failures}
+            for kind, counter in self.counters.items():
+                count = counter['count']
+                stats[kind] = {
+                    'count': count,
+                    'avg_ms': round(counter['total'] / count * 1000, 3) if count else 0,
+                    'max_ms': round(counter['max'] * 1000, 3)
+                }
+            return stats
+            
+class TLSContextManager:
+    """Shared TLS server context with certificate hot reload
+    
+    Listeners are given one long-lived dispatch context, which owns the
+    session cache and ticket keys so that reconnecting clients can resume
+    on any TLS port. Certificates live in a separate context that is swapped
+    in from the SNI callback, so a reload never invalidates sessions.
+    """
+    
+    def __init__(self, cert_file=TLS_CERT_FILE, key_file=TLS_KEY_FILE, ktls=TLS_KTLS):
+        self.cert_file = cert_file
+        self.key_file = key_file
+        self.ktls = ktls
+        self.stats = TLSStats()
+        self.cert_context = None
+        self.cert_mtimes = None
+        self.reload_count = 0
+        self.stopped = threading.Event()
+        self.context = self.create_context()
+        self.context.sni_callback = self.select_certificate
+        self.reload(force=True)
+        
+    def create_context(self):
+        """Create a server context with the shared TLS settings"""
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.minimum_version = ssl.TLSVersion.TLSv1_2
+        context.num_tickets = TLS_SESSION_TICKETS
+        if self.ktls:
+            if hasattr(ssl, 'OP_ENABLE_KTLS'):
+                context.options |= ssl.OP_ENABLE_KTLS
+            else:
+                logger.warning("Kernel TLS requested but not supported by this Python/OpenSSL build")
+                self.ktls = False
+        # The dispatch context needs a certificate of its own for clients without SNI support
+        context.load_cert_chain(self.cert_file, self.key_file)
+        return context
+        
+    def get_mtimes(self):
+        """Get modification times of the certificate and key files"""
+        return (os.stat(self.cert_file).st_mtime_ns, os.stat(self.key_file).st_mtime_ns)
+        
+    def reload(self, force=False):
+        """Reload the certificate if its files changed"""
+        try:
+            mtimes = self.get_mtimes()
+            if not force and mtimes == self.cert_mtimes:
+                return False
+                
+            cert_context = self.create_context()
+            self.cert_context = cert_context
+            if self.cert_mtimes is not None:
+                self.reload_count += 1
+                logger.info(f"TLS certificate reloaded from {self.cert_file}")
+            self.cert_mtimes = mtimes
+            return True
+            
+        except Exception as e:
+            logger.error(f"TLS certificate reload failed, keeping current certificate: {e}")
+            return False
+            
+    def select_certificate(self, ssl_object, server_name, initial_context):
+        """SNI callback: hand the handshake the current certificate context"""
+        ssl_object.context = self.cert_context
+        return None
+        
+    def watch(self, interval=TLS_RELOAD_INTERVAL):
+        """Poll the certificate files and reload them on change"""
+        while not self.stopped.wait(interval):
+            self.reload()
+            
+    def stop(self):
+        """Stop watching the certificate files"""
+        self.stopped.set()
+        
+    def wrap_socket(self, client_socket):
+        """Perform a timed server-side handshake on an accepted socket"""
+        client_socket.settimeout(TLS_HANDSHAKE_TIMEOUT)
+        tls_socket = self.context.wrap_socket(
+            client_socket,
+            server_side=True,
+            do_handshake_on_connect=False
+        )
+        started = time.perf_counter()
+        try:
+            tls_socket.do_handshake()
+        except Exception:
+            self.stats.record_failure()
+            raise
+        self.stats.record(time.perf_counter() - started, tls_socket.session_reused)
+        tls_socket.settimeout(None)
+        return tls_socket
+        
+    def get_status(self):
+        """Get TLS configuration and handshake statistics"""
+        session_stats = self.context.session_stats()
+        return {
+            'cert_file': self.cert_file,
+            'reloads': self.reload_count,
+            'ktls': self.ktls,
+            'session_cache_hits': session_stats.get('hits', 0),
+            'session_cache_misses': session_stats.get('misses', 0),
+            'handshakes': self.stats.snapshot()
+        }
+        
+def measure_tls_latency(host, port, count=20):
+    """Measure full and resumed TLS handshake latency against a listener"""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    results = {'full': [], 'resumed': []}
+    session = None
+    
+    for i in range(count * 2):
+        resume = session is not None and i % 2 == 1
+        raw_socket = socket.create_connection((host, port), timeout=TLS_HANDSHAKE_TIMEOUT)
+        started = time.perf_counter()
+        tls_socket = context.wrap_socket(raw_socket, session=session if resume else None)
+        elapsed = time.perf_counter() - started
+        results['resumed' if tls_socket.session_reused else 'full'].append(elapsed)
+        
+        # TLS 1.3 tickets arrive after the handshake; read briefly to collect them
+        tls_socket.settimeout(0.05)
+        try:
+            tls_socket.recv(1)
+        except (socket.timeout, ssl.SSLError, OSError):
+            pass
+        if not resume:
+            session = tls_socket.session
+        tls_socket.close()
+        
+    summary = {}
+    for kind, samples in results.items():
+        samples.sort()
+        summary[kind] = {
+            'count': len(samples),
+            'avg_ms': round(sum(samples) / len(samples) * 1000, 3) if samples else 0,
+            'p50_ms': round(samples[len(samples) // 2] * 1000, 3) if samples else 0,
+            'max_ms': round(samples[-1] * 1000, 3) if samples else 0
+        }
+    return summary
+    
+def new_event_loop(kind=EVENT_LOOP):
+    """Create an event loop of the configured implementation"""
+    if kind in ('auto', 'uvloop'):
+        if uvloop is not None:
+            return uvloop.new_event_loop()
+        if kind == 'uvloop':
+            logger.warning("uvloop requested but not installed, falling back to asyncio")
+    return asyncio.new_event_loop()
+    
 class SOCKS5Server:
     """SOCKS5 Proxy Server Implementation"""
     
-    def __init__(self, host='0.0.0.0', port=SOCKS_PORT):
+    def __init__(self, host='0.0.0.0', port=SOCKS_PORT, tls=None):
         self.host = host
         self.port = port
+        self.tls = tls
         self.server_socket = None
         self.running = False
+        self.stats = {'connections': 0, 'active': 0, 'errors': 0}
+        self.stats_lock = threading.Lock()
         
     def start(self):
         """Start the SOCKS5 server"""
@@ -104,7 +367,7 @@ class SOCKS5Server:
             self.server_socket.listen(128)
             self.running = True
             
-            logger.info(f"SOCKS5 server started on {self.host}:{self.port}")
+            logger.info(f"SOCKS5 server started on {self.host}:{self.port}{' (TLS)' if self.tls else ''}")
             
             while self.running:
                 try:
@@ -131,7 +394,14 @@ class SOCKS5Server:
                 
     def handle_client(self, client_socket, addr):
         """Handle SOCKS5 client connection"""
+        with self.stats_lock:
+            self.stats['connections'] += 1
+            self.stats['active'] += 1
         try:
+            # TLS handshake runs here so slow clients never stall the accept loop
+            if self.tls:
+                client_socket = self.tls.wrap_socket(client_socket)
+                
             # SOCKS5 authentication
             if not self.authenticate(client_socket):
                 return
@@ -141,8 +411,12 @@ class SOCKS5Server:
             
         except Exception as e:
             logger.error(f"Error handling SOCKS5 client {addr}: {e}")
+            with self.stats_lock:
+                self.stats['errors'] += 1
         finally:
             client_socket.close()
+            with self.stats_lock:
+                self.stats['active'] -= 1
             
     def authenticate(self, client_socket):
         """Handle SOCKS5 authentication"""
@@ -230,7 +504,10 @@ class SOCKS5Server:
             sockets = [client_socket, remote_socket]
             
             while True:
-                ready, _, _ = select.select(sockets, [], [], 60)
+                # Decrypted TLS data can be buffered where select() cannot see it
+                ready = [sock for sock in sockets if isinstance(sock, ssl.SSLSocket) and sock.pending()]
+                if not ready:
+                    ready, _, _ = select.select(sockets, [], [], 60)
                 
                 if not ready:
                     break
@@ -258,41 +535,351 @@ class SOCKS5Server:
         """Stop the SOCKS5 server"""
         self.running = False
         if self.server_socket:
+            # shutdown() wakes up the thread blocked in accept()
+            try:
+                self.server_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             self.server_socket.close()
             
-class HTTPResponseHandler(BaseHTTPRequestHandler):
+    def get_status(self):
+        """Get listener state and connection counters"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats.update(port=self.port, running=self.running, tls=bool(self.tls))
+        return stats
+        
+def port_response(port):
+    """Return the SSH-style response string shown on a response port"""
+    return PORT_RESPONSES.get(port, 'SSH-2.0-dropbear_2020.81')
+    
+class BrandingStore:
+    """Response message with hot reload from BRANDING_FILE
+    
+    The file is polled from the event loop (SIGHUP forces a re-read); a new
+    message only drops the cached response pages, so tunnels and open
+    connections are left alone.
+    """
+    
+    def __init__(self, path=BRANDING_FILE):
+        self.path = path
+        self.response_msg = RESPONSE_MSG
+        self.mtime = None
+        self.reload_count = 0
+        self.loop = None
+        self.timer = None
+        self.reload(force=True)
+        
+    def get_mtime(self):
+        """Modification time of the branding file, None when it is missing"""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+            
+    def reload(self, force=False):
+        """Re-read RESPONSE_MSG if the file changed; runs on the event loop once watched"""
+        mtime = self.get_mtime()
+        if not force and mtime == self.mtime:
+            return False
+            
+        message = RESPONSE_MSG
+        if mtime is not None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    for line in f:
+                        key, _, value = line.strip().partition('=')
+                        if key == 'RESPONSE_MSG':
+                            message = value.strip().strip('"\'')
+            except (OSError, UnicodeDecodeError) as e:
+                logger.error(f"Keeping current response message, failed to read {self.path}: {e}")
+                return False
+        self.mtime = mtime
+        if message == self.response_msg:
+            return False
+            
+        self.response_msg = message
+        HTTPResponseHandler.response_cache.clear()
+        self.reload_count += 1
+        logger.info(f"Response message reloaded from {self.path}")
+        return True
+        
+    def watch(self, loop):
+        """Start polling the branding file from the event loop"""
+        self.loop = loop
+        self.timer = loop.call_later(BRANDING_POLL_INTERVAL, self.poll)
+        
+    def poll(self):
+        """Check the branding file and schedule the next check"""
+        self.reload()
+        self.timer = self.loop.call_later(BRANDING_POLL_INTERVAL, self.poll)
+        
+    def unwatch(self):
+        """Stop polling; runs on the event loop"""
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+    
+def parse_port_modes(value):
+    """Parse "port=mode,..." into a dictionary of response port modes"""
+    modes = {}
+    for entry in value.split(','):
+        if '=' not in entry:
+            continue
+        port, mode = (part.strip() for part in entry.split('=', 1))
+        mode = mode.lower()
+        if mode not in RESPONSE_MODES or not port.isdigit():
+            logger.warning(f"Ignoring unknown response mode '{mode}' for port {port}")
+            continue
+        modes[int(port)] = mode
+    return modes
+    
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with percentile estimates"""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        
+    def record(self, seconds):
+        """Add one observation"""
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+            
+    def percentile(self, fraction, counts):
+        """Upper bound of the bucket holding the given fraction of observations"""
+        rank = fraction * sum(counts)
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+        
+    def snapshot(self):
+        """Summary in milliseconds"""
+        counts = list(self.counts)
+        count = sum(counts)
+        if not count:
+            return {'count': 0}
+        return {
+            'count': count,
+            'avg_ms': round(self.total / count * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+            'p50_ms': round(self.percentile(0.50, counts) * 1000, 3),
+            'p95_ms': round(self.percentile(0.95, counts) * 1000, 3),
+            'p99_ms': round(self.percentile(0.99, counts) * 1000, 3)
+        }
+        
+class RequestMetrics:
+    """Response port counters by route and status plus latency histograms
+    
+    Only the shared event loop thread writes these, so increments need no
+    lock; readers on other threads take copies in snapshot().
+    """
+    
+    def __init__(self):
+        self.routes = {}
+        self.statuses = {}
+        self.latency = {}
+        
+    def record(self, route, status, seconds):
+        """Count one request or probe and its handling time"""
+        self.routes[route] = self.routes.get(route, 0) + 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        histogram = self.latency.get(route)
+        if histogram is None:
+            histogram = self.latency[route] = LatencyHistogram()
+        histogram.record(seconds)
+        
+    def snapshot(self):
+        """Copy of the counters and latency summaries"""
+        return {
+            'routes': dict(self.routes),
+            'statuses': {str(status): count for status, count in dict(self.statuses).items()},
+            'latency': {route: histogram.snapshot() for route, histogram in dict(self.latency).items()}
+        }
+        
+class BannerProtocol(asyncio.Protocol):
+    """Write a fixed banner on accept and close; no request is read or parsed"""
+    
+    def __init__(self, server):
+        self.server = server
+        
+    def connection_made(self, transport):
+        started = time.perf_counter()
+        transport.write(self.server.banner)
+        transport.close()
+        self.server.probes += 1
+        self.server.metrics.record('banner', 'banner', time.perf_counter() - started)
+        
+class ReadGuardStats:
+    """Counters for connections cut off by read deadlines or header limits"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(GUARD_COUNTERS, 0)
+        
+    def record(self, reason):
+        with self.lock:
+            self.counts[reason] += 1
+            
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counts)
+            
+class RequestRejected(Exception):
+    """Request refused by the read guard; answered with code, then closed"""
+    
+    def __init__(self, code, reason):
+        super().__init__(reason)
+        self.code = code
+        self.reason = reason
+        
+class IdleTimeout(Exception):
+    """No request started within the idle timeout; the connection is closed quietly"""
+    
+def rejection_response(code):
+    """Minimal response sent before closing a rejected connection"""
+    return (f'HTTP/1.1 {code} {HTTPStatus(code).phrase}\r\n'
+            'Connection: close\r\nContent-Length: 0\r\n\r\n').encode('latin-1')
+            
+async def read_before(read, deadline, phase):
+    """Await a stream read that must finish by an absolute loop deadline"""
+    remaining = deadline - asyncio.get_running_loop().time()
+    try:
+        if remaining <= 0:
+            read.close()  # never awaited, so discard it without a warning
+            raise asyncio.TimeoutError
+        return await asyncio.wait_for(read, remaining)
+    except asyncio.TimeoutError:
+        raise RequestRejected(408, f'{phase}_timeouts')
+    except (ValueError, asyncio.LimitOverrunError):
+        raise RequestRejected(431, 'oversized_headers')
+        
+async def read_http_request(reader, idle_timeout=KEEPALIVE_TIMEOUT):
+    """Read one request head and drain its body; None when the client closed
+    
+    After the first byte, the request line, headers and body each have an
+    absolute deadline so a client dribbling bytes is cut off.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        first = await asyncio.wait_for(reader.read(1), idle_timeout)
+    except asyncio.TimeoutError:
+        raise IdleTimeout()
+    if not first:
+        return None
+        
+    line = first + await read_before(reader.readline(), loop.time() + REQUEST_LINE_TIMEOUT, 'request_line')
+    if line in (b'\r\n', b'\n'):
+        line = await read_before(reader.readline(), loop.time() + REQUEST_LINE_TIMEOUT, 'request_line')
+    if not line:
+        return None
+        
+    parts = line.decode('iso-8859-1').split()
+    if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+        raise ValueError(f"Bad request line: {line[:80]!r}")
+        
+    deadline = loop.time() + HEADER_TIMEOUT
+    header_lines = []
+    header_bytes = 0
+    while True:
+        header_line = await read_before(reader.readline(), deadline, 'header')
+        if header_line in (b'\r\n', b'\n', b''):
+            break
+        header_lines.append(header_line)
+        header_bytes += len(header_line)
+        if len(header_lines) > MAX_HEADERS:
+            raise RequestRejected(431, 'too_many_headers')
+        if header_bytes > MAX_HEADER_BYTES:
+            raise RequestRejected(431, 'oversized_headers')
+    headers = parse_headers(io.BytesIO(b''.join(header_lines) + b'\r\n'))
+    
+    # Chunked bodies are not supported; the caller closes the connection
+    if 'Transfer-Encoding' in headers:
+        raise ValueError("Chunked request body")
+    length = int(headers.get('Content-Length', 0) or 0)
+    if length:
+        await read_before(reader.readexactly(length), loop.time() + BODY_TIMEOUT, 'body')
+        
+    return parts[0], parts[1], parts[2], headers
+    
+class HTTPResponseHandler:
     """Custom HTTP response handler"""
     
-    def do_GET(self):
-        """Handle GET requests"""
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.send_header('Server', 'Mastermind-Proxy/1.0')
-        self.end_headers()
+    # Encoded page and ETag per port; cleared when the response message changes
+    response_cache = {}
+    
+    def __init__(self, port, status_document=None):
+        self.port = port
+        self.status_document = status_document
         
-        # Generate response based on port
-        response = self.generate_response()
-        self.wfile.write(response.encode('utf-8'))
+    def respond(self, command, path, version, headers, last_request=False):
+        """Build the full response for one request; returns (bytes, status, close)"""
+        if path.split('?', 1)[0] == '/api/status' and self.status_document:
+            body, etag = self.status_document(), None
+            content_type = 'application/json'
+        else:
+            body, etag = self.get_cached_response()
+            content_type = 'text/html'
         
-    def do_POST(self):
-        """Handle POST requests"""
-        self.do_GET()
+        connection = headers.get('Connection', '').lower()
+        if version == 'HTTP/1.0':
+            close = last_request or 'keep-alive' not in connection
+        else:
+            close = last_request or 'close' in connection
+            
+        if_none_match = headers.get('If-None-Match', '')
+        if etag and etag in [tag.strip() for tag in if_none_match.split(',')]:
+            status = '304 Not Modified'
+            lines = [('ETag', etag)]
+            body = b''
+        else:
+            status = '200 OK'
+            lines = [
+                ('Content-type', content_type),
+                ('Server', 'Mastermind-Proxy/1.0'),
+                ('Content-Length', str(len(body)))
+            ]
+            if etag:
+                lines.append(('ETag', etag))
+            else:
+                lines.append(('Cache-Control', 'no-cache'))
+                lines.append(('Access-Control-Allow-Origin', '*'))
+            if command == 'HEAD':
+                body = b''
+        lines.append(('Date', formatdate(usegmt=True)))
+        if close:
+            lines.append(('Connection', 'close'))
+        elif version == 'HTTP/1.0':
+            lines.append(('Connection', 'keep-alive'))
+            
+        head = f'HTTP/1.1 {status}\r\n' + ''.join(f'{name}: {value}\r\n' for name, value in lines)
+        logger.info(f'HTTP {self.port}: "{command}" {status[:3]}')
+        return head.encode('latin-1') + b'\r\n' + body, int(status[:3]), close
+        
+    def get_cached_response(self):
+        """Return the encoded response for this port, rendering it once"""
+        port = self.port
+        cached = self.response_cache.get(port)
+        if cached is None:
+            body = self.generate_response().encode('utf-8')
+            cached = (body, '"%s"' % hashlib.sha1(body).hexdigest()[:20])
+            self.response_cache[port] = cached
+        return cached
         
     def generate_response(self):
         """Generate SSH server response message for tunneling apps"""
-        port = self.server.server_port
-        
-        # Generate SSH-style server response like shown in NPV Tunnel
-        # Updated for new port structure (9000-9003) - matches NPV Tunnel display
-        ssh_responses = {
-            9000: 'SSH-2.0-dropbear_2020.81',
-            9001: '<div style="font-family: monospace; background-color: #000; color: #0f0; padding: 10px; text-align: center; border: 1px solid #0f0;"><strong style="font-size: 18px;">MasterMind\'s Server</strong><br>For support: Contact <span style="color: #00f;">@bitcockli</span> on Telegram<br><em style="color: #f00;">WARNING: Unauthorized access prohibited. All connections monitored.</em></div>',
-            9002: 'HTTP/1.1 101 <span style="color: #9fff;"><strong>MasterMind!!</strong></span>',
-            9003: 'SSH-2.0-OpenSSH_8.9p1 Ubuntu-3ubuntu0.1'
-        }
+        port = self.port
         
         # Get response for current port or default
-        response = ssh_responses.get(port, 'SSH-2.0-dropbear_2020.81')
+        response = port_response(port)
+        message = branding.response_msg
         
         # Create minimal HTML wrapper that shows the SSH response
         html = f"""<!DOCTYPE html>
@@ -320,50 +907,480 @@ class HTTPResponseHandler(BaseHTTPRequestHandler):
     <div class="ssh-response">
 SSH Server response: {response}
     </div>
+    <p>{message}</p>
 </body>
 </html>"""
         
         return html
         
-    def log_message(self, format, *args):
-        """Override log message to use our logger"""
-        logger.info(f"HTTP {self.server.server_port}: {format % args}")
-        
+branding = BrandingStore()
+
 class HTTPResponseServer:
-    """HTTP Response Server"""
+    """HTTP Response Server
     
-    def __init__(self, port):
+    Runs as a listener on the shared event loop, so every response port is
+    served without a thread of its own; RESPONSE_CONCURRENCY bounds how many
+    requests one port has in flight. In banner mode the port writes its SSH
+    banner on accept and closes without reading anything.
+    """
+    
+    def __init__(self, port, concurrency=RESPONSE_CONCURRENCY, mode='http', status_document=None):
         self.port = port
+        self.mode = mode
+        self.banner = (port_response(port) + '\r\n').encode('utf-8')
+        self.probes = 0
+        self.metrics = RequestMetrics()
+        self.guard = ReadGuardStats()
+        self.handler = HTTPResponseHandler(port, status_document)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.connections = set()
         self.server = None
-        self.thread = None
+        self.loop = None
         
-    def start(self):
+    async def start(self):
         """Start the HTTP response server"""
         try:
-            self.server = HTTPServer(('0.0.0.0', self.port), HTTPResponseHandler)
-            self.thread = threading.Thread(target=self.server.serve_forever)
-            self.thread.daemon = True
-            self.thread.start()
-            
-            logger.info(f"HTTP response server started on port {self.port}")
+            self.loop = asyncio.get_running_loop()
+            if self.mode == 'banner':
+                self.server = await self.loop.create_server(
+                    lambda: BannerProtocol(self), '0.0.0.0', self.port, reuse_address=True
+                )
+            else:
+                self.server = await asyncio.start_server(
+                    self.handle_connection, '0.0.0.0', self.port,
+                    reuse_address=True, limit=MAX_HEADER_BYTES
+                )
+            logger.info(f"HTTP response server started on port {self.port} ({self.mode} mode)")
             
         except Exception as e:
             logger.error(f"Failed to start HTTP response server on port {self.port}: {e}")
             
+    async def handle_connection(self, reader, writer):
+        """Serve keep-alive requests on one connection, after the banner if enabled"""
+        self.connections.add(writer)
+        handled = 0
+        try:
+            if self.mode == 'banner+http':
+                writer.write(self.banner)
+                self.probes += 1
+                
+            while handled < KEEPALIVE_MAX_REQUESTS:
+                # A new connection must start its request promptly; keep-alive may idle longer
+                idle_timeout = KEEPALIVE_TIMEOUT if handled else min(KEEPALIVE_TIMEOUT, REQUEST_LINE_TIMEOUT)
+                try:
+                    request = await read_http_request(reader, idle_timeout)
+                except IdleTimeout:
+                    if not handled:
+                        self.guard.record('idle_timeouts')
+                    break
+                except RequestRejected as e:
+                    self.guard.record(e.reason)
+                    writer.write(rejection_response(e.code))
+                    await asyncio.wait_for(writer.drain(), WRITE_TIMEOUT)
+                    break
+                if request is None:
+                    break
+                handled += 1
+                command, path, version, headers = request
+                started = time.perf_counter()
+                async with self.semaphore:
+                    response, status, close = self.handler.respond(
+                        command, path, version, headers, handled >= KEEPALIVE_MAX_REQUESTS
+                    )
+                    route = 'api' if path.startswith('/api/status') else 'http'
+                    self.metrics.record(route, status, time.perf_counter() - started)
+                # Flush outside the slot so a client that stops reading cannot hold it
+                writer.write(response)
+                await asyncio.wait_for(writer.drain(), WRITE_TIMEOUT)
+                if close:
+                    break
+                    
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except Exception as e:
+            if not writer.is_closing():
+                logger.error(f"HTTP response error on port {self.port}: {e}")
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+            
+    def get_status(self):
+        """Request counters and latency for this port"""
+        return {
+            'port': self.port,
+            'mode': self.mode,
+            'running': self.server is not None and self.server.is_serving(),
+            'active_connections': len(self.connections),
+            'probes': self.probes,
+            'metrics': self.metrics.snapshot(),
+            'read_guard': self.guard.snapshot()
+        }
+        
+    def close(self):
+        """Close the listener and open connections; runs on the event loop"""
+        if self.server:
+            self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+            
     def stop(self):
         """Stop the HTTP response server"""
-        if self.server:
-            self.server.shutdown()
-            self.server.server_close()
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.close)
+            
+class CompressionStats:
+    """Counters for WebSocket permessage-deflate activity"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.messages_compressed = 0
+        self.messages_bypassed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.0
+        self.connections_bypassed = 0
+        
+    def record(self, raw_size, compressed_size, cpu_time):
+        """Record one compressed message"""
+        with self.lock:
+            self.messages_compressed += 1
+            self.bytes_in += raw_size
+            self.bytes_out += compressed_size
+            self.cpu_time += cpu_time
+            
+    def record_bypass(self):
+        """Record one message sent without compression"""
+        with self.lock:
+            self.messages_bypassed += 1
+            
+    def record_connection_bypass(self):
+        """Record a connection that switched compression off"""
+        with self.lock:
+            self.connections_bypassed += 1
+            
+    def snapshot(self):
+        """Return counters as a dictionary"""
+        with self.lock:
+            return {
+                'messages_compressed': self.messages_compressed,
+                'messages_bypassed': self.messages_bypassed,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved': self.bytes_in - self.bytes_out,
+                'cpu_time': round(self.cpu_time, 6),
+                'connections_bypassed': self.connections_bypassed
+            }
+            
+class AdaptivePerMessageDeflate(PerMessageDeflate):
+    """permessage-deflate that stops compressing incompressible payloads
+    
+    The first ``sample_size`` outgoing messages are compressed and measured.
+    If they saved less than ``min_saving`` of their size (typical for SSH
+    traffic, which is already encrypted) the remaining messages are sent with
+    RSV1 cleared, which RFC 7692 allows on a negotiated connection.
+    """
+    
+    def __init__(self, *args, stats=None, adaptive=True, sample_size=WS_COMPRESSION_SAMPLE,
+                 min_saving=WS_COMPRESSION_MIN_SAVING, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats or CompressionStats()
+        self.adaptive = adaptive
+        self.sample_size = sample_size
+        self.min_saving = min_saving
+        self.sampled_messages = 0
+        self.sampled_in = 0
+        self.sampled_out = 0
+        self.bypass = False
+        self.in_message = False
+        self.message_compressed = False
+        
+    def encode(self, frame):
+        """Encode an outgoing frame, bypassing compression when unprofitable"""
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+            
+        # The bypass decision is only taken at message boundaries
+        if frame.opcode is not CONT:
+            self.message_compressed = not self.bypass
+            
+        if not self.message_compressed:
+            if frame.fin:
+                self.stats.record_bypass()
+            return frame
+            
+        started = time.thread_time()
+        encoded = super().encode(frame)
+        cpu_time = time.thread_time() - started
+        self.stats.record(len(frame.data), len(encoded.data), cpu_time)
+        
+        if self.adaptive and not self.bypass:
+            self.sampled_in += len(frame.data)
+            self.sampled_out += len(encoded.data)
+            if frame.fin:
+                self.sampled_messages += 1
+                if self.sampled_messages >= self.sample_size:
+                    self.evaluate_sample()
+                    
+        return encoded
+        
+    def evaluate_sample(self):
+        """Disable compression if the sampled messages did not shrink enough"""
+        self.adaptive = False
+        if not self.sampled_in:
+            return
+        saving = 1 - self.sampled_out / self.sampled_in
+        if saving < self.min_saving:
+            self.bypass = True
+            self.stats.record_connection_bypass()
+            logger.debug(f"Compression bypassed after {self.sampled_messages} messages (saving {saving:.1%})")
+            
+class CompressionExtensionFactory(ServerPerMessageDeflateFactory):
+    """Server permessage-deflate factory producing instrumented extensions"""
+    
+    def __init__(self, stats, adaptive=True, level=WS_COMPRESSION_LEVEL):
+        super().__init__(
+            server_max_window_bits=12,
+            client_max_window_bits=12,
+            compress_settings={'memLevel': 5, 'level': level}
+        )
+        self.stats = stats
+        self.adaptive = adaptive
+        
+    def process_request_params(self, params, accepted_extensions):
+        """Negotiate parameters and wrap the extension with counters"""
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, AdaptivePerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            stats=self.stats,
+            adaptive=self.adaptive
+        )
+        
+def parse_compression_paths(value):
+    """Parse "path=mode,..." into a dictionary of per-path compression modes"""
+    paths = {}
+    for entry in value.split(','):
+        if '=' not in entry:
+            continue
+        path, mode = (part.strip() for part in entry.split('=', 1))
+        mode = mode.lower()
+        if mode not in WS_COMPRESSION_MODES:
+            logger.warning(f"Ignoring unknown compression mode '{mode}' for {path}")
+            continue
+        paths[path] = mode
+    return paths
+    
+class PortAllocator:
+    """Constant-time lease allocator for local dynamic-forward ports
+    
+    Free ports sit in a FIFO queue and leases are tracked in a byte map
+    indexed by port offset, so allocate and release never scan the range.
+    A leased port is withheld from other tunnels until it is released,
+    which closes the probe-then-bind race of searching for a free port.
+    """
+    
+    def __init__(self, port_range=SSH_FORWARD_PORTS):
+        start, end = (int(port) for port in port_range.split('-'))
+        if not 0 < start <= end < 65536:
+            raise ValueError(f"invalid port range {port_range}")
+        self.start = start
+        self.end = end
+        self.leased = bytearray(end - start + 1)
+        self.free = deque(range(start, end + 1))
+        self.lock = threading.Lock()
+        
+    def allocate(self):
+        """Lease a port, or return None if the range is exhausted"""
+        with self.lock:
+            if not self.free:
+                return None
+            port = self.free.popleft()
+            self.leased[port - self.start] = 1
+            return port
+            
+    def release(self, port):
+        """Return a leased port to the back of the free queue"""
+        with self.lock:
+            if port is None or not self.start <= port <= self.end:
+                return
+            if self.leased[port - self.start]:
+                self.leased[port - self.start] = 0
+                # Reusing the least recently freed port avoids TIME_WAIT collisions
+                self.free.append(port)
+                
+    def get_status(self):
+        """Get allocator usage"""
+        with self.lock:
+            return {
+                'range': f"{self.start}-{self.end}",
+                'leased': len(self.leased) - len(self.free),
+                'free': len(self.free)
+            }
+            
+class SharedTunnelPool:
+    """Persistent ssh -D tunnels shared by every client of a route
+    
+    A dynamic forward is a SOCKS server, so one authenticated SSH session can
+    carry many client streams. Tunnels are created on first use, reused
+    round-robin and replaced when their ssh process exits.
+    """
+    
+    def __init__(self, proxy, size=WS_SHARED_TUNNELS):
+        self.proxy = proxy
+        self.size = max(1, size)
+        self.tunnels = []
+        self.next_index = 0
+        self.lock = None
+        
+    async def acquire(self):
+        """Return the SOCKS port of a live shared tunnel"""
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+            
+        async with self.lock:
+            live_tunnels = []
+            for ssh_process, socks_port in self.tunnels:
+                if ssh_process.poll() is None:
+                    live_tunnels.append((ssh_process, socks_port))
+                else:
+                    self.proxy.port_allocator.release(socks_port)
+            self.tunnels = live_tunnels
+            if len(self.tunnels) < self.size:
+                ssh_process, socks_port = await self.proxy.create_ssh_tunnel()
+                if not ssh_process:
+                    return None
+                self.tunnels.append((ssh_process, socks_port))
+                return socks_port
+                
+            self.next_index = (self.next_index + 1) % len(self.tunnels)
+            return self.tunnels[self.next_index][1]
+            
+    def close(self):
+        """Terminate all shared tunnels"""
+        for ssh_process, socks_port in self.tunnels:
+            ssh_process.terminate()
+            self.proxy.port_allocator.release(socks_port)
+        self.tunnels = []
+        
+class WebSocketRoute:
+    """One entry of the WebSocket routing table with its metrics"""
+    
+    BACKENDS = ('ssh', 'ssh-shared', 'tcp')
+    
+    def __init__(self, path, backend, host=None, port=None, compression=None):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"unknown backend '{backend}'")
+        if backend == 'tcp' and not (host and port):
+            raise ValueError("tcp backend requires host and port")
+        if compression is not None and compression not in WS_COMPRESSION_MODES:
+            raise ValueError(f"unknown compression mode '{compression}'")
+            
+        self.path = path.rstrip('/') or '/'
+        self.backend = backend
+        self.host = host
+        self.port = port
+        self.compression = compression
+        self.pool = None
+        self.stats = {
+            'connections': 0,
+            'active': 0,
+            'errors': 0,
+            'bytes_up': 0,
+            'bytes_down': 0
+        }
+        
+    def describe(self):
+        """Return the backend as a short string"""
+        if self.backend == 'tcp':
+            return f"tcp:{self.host}:{self.port}"
+        return self.backend
+        
+def parse_routes(value, default_backend=WS_DEFAULT_BACKEND):
+    """Parse WS_ROUTES into a list of WebSocketRoute objects"""
+    routes = []
+    for entry in value.split(','):
+        if '=' not in entry:
+            continue
+        path, spec = (part.strip() for part in entry.split('=', 1))
+        spec, *options = spec.split(';')
+        options = dict(option.split('=', 1) for option in options if '=' in option)
+        try:
+            backend, *target = spec.split(':')
+            host, port = (target[0], int(target[1])) if len(target) == 2 else (None, None)
+            routes.append(WebSocketRoute(path, backend, host, port, options.get('compression')))
+        except (ValueError, IndexError) as e:
+            logger.warning(f"Ignoring WebSocket route '{entry}': {e}")
             
+    backend, *target = default_backend.split(':')
+    host, port = (target[0], int(target[1])) if len(target) == 2 else (None, None)
+    routes.append(WebSocketRoute('/', backend, host, port))
+    return routes
+    
+class WebSocketRouter:
+    """Longest-prefix path router compiled into a single regular expression"""
+    
+    def __init__(self, routes):
+        self.default = next((route for route in routes if route.path == '/'), None)
+        if self.default is None:
+            self.default = WebSocketRoute('/', 'ssh')
+            
+        self.routes = sorted(
+            (route for route in routes if route.path != '/'),
+            key=lambda route: len(route.path),
+            reverse=True
+        )
+        alternatives = '|'.join(f'({re.escape(route.path)})(?=/|$)' for route in self.routes)
+        self.pattern = re.compile(alternatives) if alternatives else None
+        
+    def match(self, path):
+        """Return the route serving a request path"""
+        if self.pattern:
+            path = path.split('?', 1)[0]
+            matched = self.pattern.match(path)
+            if matched:
+                return self.routes[matched.lastindex - 1]
+        return self.default
+        
+    def all_routes(self):
+        """Return every route including the default one"""
+        return self.routes + [self.default]
+        
 class WebSocketToSSHProxy:
     """WebSocket to SSH SOCKS proxy implementation"""
     
-    def __init__(self, host='0.0.0.0', port=WEBSOCKET_PORT):
+    def __init__(self, host='0.0.0.0', port=WEBSOCKET_PORT, compression=WS_COMPRESSION,
+                 compression_paths=None, tls=None, routes=None):
         self.host = host
         self.port = port
+        self.tls = tls
         self.server = None
         self.ssh_connections = {}
+        self.ssh_ports = {}
+        self.port_allocator = PortAllocator()
+        
+        if routes is None:
+            routes = parse_routes(WS_ROUTES)
+        self.router = WebSocketRouter(routes)
+        for route in self.router.all_routes():
+            if route.backend == 'ssh-shared':
+                route.pool = SharedTunnelPool(self)
+        
+        if compression not in WS_COMPRESSION_MODES:
+            logger.warning(f"Unknown WS_COMPRESSION '{compression}', using adaptive")
+            compression = 'adaptive'
+        self.compression = compression
+        if compression_paths is None:
+            compression_paths = parse_compression_paths(WS_COMPRESSION_PATHS)
+        self.compression_paths = compression_paths
+        self.compression_stats = CompressionStats()
+        self.compression_extensions = {
+            'off': [],
+            'deflate': [CompressionExtensionFactory(self.compression_stats, adaptive=False)],
+            'adaptive': [CompressionExtensionFactory(self.compression_stats, adaptive=True)]
+        }
         
     async def start(self):
         """Start the WebSocket proxy server"""
@@ -372,40 +1389,110 @@ class WebSocketToSSHProxy:
                 self.handle_websocket_connection,
                 self.host,
                 self.port,
-                subprotocols=["socks"]
+                subprotocols=["socks"],
+                compression=None,
+                process_request=self.select_compression,
+                ssl=self.tls.context if self.tls else None,
+                ssl_handshake_timeout=TLS_HANDSHAKE_TIMEOUT if self.tls else None
             )
-            logger.info(f"WebSocket-to-SSH SOCKS proxy started on {self.host}:{self.port}")
+            logger.info(f"WebSocket-to-SSH SOCKS proxy started on {self.host}:{self.port} "
+                        f"(compression: {self.compression}, TLS: {bool(self.tls)})")
             
         except Exception as e:
             logger.error(f"Failed to start WebSocket-to-SSH proxy: {e}")
             
-    async def handle_websocket_connection(self, websocket, path):
-        """Handle WebSocket connections with SSH SOCKS tunneling"""
+    def compression_mode(self, path):
+        """Return the compression mode configured for a request path"""
+        path = urlparse(path).path
+        if path in self.compression_paths:
+            return self.compression_paths[path]
+        route = self.router.match(path)
+        return route.compression or self.compression
+        
+    def select_compression(self, connection, request):
+        """Offer permessage-deflate according to the listener/path configuration"""
+        mode = self.compression_mode(request.path)
+        connection.protocol.available_extensions = self.compression_extensions[mode]
+        return None
+        
+    def get_compression_stats(self):
+        """Get permessage-deflate counters for this listener"""
+        stats = self.compression_stats.snapshot()
+        stats['mode'] = self.compression
+        stats['paths'] = dict(self.compression_paths)
+        return stats
+        
+    def get_status(self):
+        """Get listener state, tunnel counts and per-feature counters"""
+        return {
+            'port': self.port,
+            'running': self.server is not None and self.server.is_serving(),
+            'tls': bool(self.tls),
+            'active_tunnels': len(self.ssh_connections),
+            'shared_tunnels': sum(len(route.pool.tunnels) for route in self.router.all_routes() if route.pool),
+            'forward_ports': self.port_allocator.get_status(),
+            'routes': self.get_route_stats(),
+            'compression': self.get_compression_stats()
+        }
+        
+    def get_route_stats(self):
+        """Get per-route connection and traffic counters"""
+        return {
+            route.path: dict(route.stats, backend=route.describe())
+            for route in self.router.all_routes()
+        }
+        
+    async def handle_websocket_connection(self, websocket, path=None):
+        """Handle WebSocket connections, routing them to a backend by path"""
+        route = None
         try:
             remote_addr = websocket.remote_address
-            logger.info(f"New WebSocket connection from {remote_addr}")
+            if path is None:
+                path = websocket.request.path
+            route = self.router.match(path)
+            route.stats['connections'] += 1
+            route.stats['active'] += 1
+            logger.info(f"New WebSocket connection from {remote_addr} for {path} -> {route.describe()}")
             
             # Perform custom handshake with adjustable 101 response
             await self.custom_handshake(websocket)
             
-            # Create SSH tunnel and SOCKS proxy
-            ssh_process, socks_port = await self.create_ssh_tunnel()
-            
-            if ssh_process and socks_port:
-                # Store SSH connection
-                connection_id = f"{remote_addr[0]}:{remote_addr[1]}"
-                self.ssh_connections[connection_id] = ssh_process
+            if route.backend == 'tcp':
+                await self.create_tunnel_bridge(websocket, route.port, host=route.host, route=route)
                 
-                # Create bridge between WebSocket and SOCKS proxy
-                await self.create_tunnel_bridge(websocket, socks_port)
+            elif route.backend == 'ssh-shared':
+                socks_port = await route.pool.acquire()
+                if socks_port:
+                    await self.create_tunnel_bridge(websocket, socks_port, route=route)
+                else:
+                    route.stats['errors'] += 1
+                    await websocket.close(code=1011, reason="SSH tunnel creation failed")
+                    
             else:
-                await websocket.close(code=1011, reason="SSH tunnel creation failed")
+                # Create SSH tunnel and SOCKS proxy
+                ssh_process, socks_port = await self.create_ssh_tunnel()
+                
+                if ssh_process and socks_port:
+                    # Store SSH connection
+                    connection_id = f"{remote_addr[0]}:{remote_addr[1]}"
+                    self.ssh_connections[connection_id] = ssh_process
+                    self.ssh_ports[connection_id] = socks_port
+                    
+                    # Create bridge between WebSocket and SOCKS proxy
+                    await self.create_tunnel_bridge(websocket, socks_port, route=route)
+                else:
+                    route.stats['errors'] += 1
+                    await websocket.close(code=1011, reason="SSH tunnel creation failed")
                 
         except websockets.exceptions.ConnectionClosed:
             logger.debug("WebSocket connection closed")
         except Exception as e:
+            if route:
+                route.stats['errors'] += 1
             logger.error(f"WebSocket connection error: {e}")
         finally:
+            if route:
+                route.stats['active'] -= 1
             # Clean up SSH connection
             if hasattr(websocket, 'remote_address'):
                 connection_id = f"{websocket.remote_address[0]}:{websocket.remote_address[1]}"
@@ -417,7 +1504,8 @@ class WebSocketToSSHProxy:
         try:
             # Determine response template based on User-Agent or other headers
             template = "default"
-            user_agent = websocket.request_headers.get("User-Agent", "").lower()
+            request_headers = getattr(websocket, 'request_headers', None) or websocket.request.headers
+            user_agent = request_headers.get("User-Agent", "").lower()
             
             if "dropbear" in user_agent:
                 template = "dropbear"
@@ -428,7 +1516,7 @@ class WebSocketToSSHProxy:
             headers = RESPONSE_TEMPLATES.get(template, RESPONSE_TEMPLATES["default"])
             
             # Generate proper WebSocket accept key
-            websocket_key = websocket.request_headers.get("Sec-WebSocket-Key", "")
+            websocket_key = request_headers.get("Sec-WebSocket-Key", "")
             if websocket_key:
                 accept_key = self.generate_websocket_accept_key(websocket_key)
                 headers["Sec-WebSocket-Accept"] = accept_key
@@ -447,9 +1535,13 @@ class WebSocketToSSHProxy:
         
     async def create_ssh_tunnel(self):
         """Create SSH tunnel with dynamic SOCKS proxy"""
+        socks_port = None
         try:
-            # Find available port for SOCKS proxy
-            socks_port = self.find_available_port()
+            # Lease a port for the SOCKS proxy; it stays reserved until cleanup
+            socks_port = self.port_allocator.allocate()
+            if socks_port is None:
+                logger.error(f"No free SOCKS ports left in range {SSH_FORWARD_PORTS}")
+                return None, None
             
             # Build SSH command for dynamic port forwarding
             ssh_cmd = [
@@ -459,7 +1551,8 @@ class WebSocketToSSHProxy:
                 "-o", "StrictHostKeyChecking=no",
                 "-o", "UserKnownHostsFile=/dev/null",
                 "-o", "ServerAliveInterval=30",
-                "-o", "ServerAliveCountMax=3"
+                "-o", "ServerAliveCountMax=3",
+                "-o", "ExitOnForwardFailure=yes"
             ]
             
             # Add authentication
@@ -497,22 +1590,13 @@ class WebSocketToSSHProxy:
             else:
                 logger.error("SSH process failed to start")
                 
+            self.port_allocator.release(socks_port)
             return None, None
             
         except Exception as e:
             logger.error(f"SSH tunnel creation error: {e}")
+            self.port_allocator.release(socks_port)
             return None, None
-            
-    def find_available_port(self, start_port=10000, end_port=65535):
-        """Find an available port for SOCKS proxy"""
-        for port in range(start_port, end_port):
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.bind(('127.0.0.1', port))
-                    return port
-            except OSError:
-                continue
-        return None
         
     async def test_socks_connection(self, socks_port):
         """Test if SOCKS proxy is working"""
@@ -525,18 +1609,18 @@ class WebSocketToSSHProxy:
         except Exception:
             return False
             
-    async def create_tunnel_bridge(self, websocket, socks_port):
-        """Create bidirectional bridge between WebSocket and SOCKS proxy"""
+    async def create_tunnel_bridge(self, websocket, socks_port, host='127.0.0.1', route=None):
+        """Create bidirectional bridge between WebSocket and a backend stream"""
         try:
-            # Connect to SOCKS proxy
-            reader, writer = await asyncio.open_connection('127.0.0.1', socks_port)
+            # Connect to SOCKS proxy or routed backend
+            reader, writer = await asyncio.open_connection(host, socks_port)
             
             # Create tasks for bidirectional data relay
             ws_to_socks_task = asyncio.create_task(
-                self.websocket_to_socks(websocket, writer)
+                self.websocket_to_socks(websocket, writer, route)
             )
             socks_to_ws_task = asyncio.create_task(
-                self.socks_to_websocket(reader, websocket)
+                self.socks_to_websocket(reader, websocket, route)
             )
             
             # Wait for either task to complete (indicating connection closed)
@@ -548,34 +1632,39 @@ class WebSocketToSSHProxy:
             # Cancel remaining tasks
             for task in pending:
                 task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
                 
             # Close writer
             writer.close()
             await writer.wait_closed()
             
         except Exception as e:
+            if route:
+                route.stats['errors'] += 1
             logger.error(f"Tunnel bridge error: {e}")
             
-    async def websocket_to_socks(self, websocket, writer):
+    async def websocket_to_socks(self, websocket, writer, route=None):
         """Relay data from WebSocket to SOCKS proxy"""
         try:
             async for message in websocket:
-                if isinstance(message, bytes):
-                    writer.write(message)
-                    await writer.drain()
-                elif isinstance(message, str):
-                    writer.write(message.encode())
-                    await writer.drain()
+                if isinstance(message, str):
+                    message = message.encode()
+                writer.write(message)
+                if route:
+                    route.stats['bytes_up'] += len(message)
+                await writer.drain()
         except Exception as e:
             logger.debug(f"WebSocket to SOCKS relay ended: {e}")
             
-    async def socks_to_websocket(self, reader, websocket):
+    async def socks_to_websocket(self, reader, websocket, route=None):
         """Relay data from SOCKS proxy to WebSocket"""
         try:
             while True:
                 data = await reader.read(4096)
                 if not data:
                     break
+                if route:
+                    route.stats['bytes_down'] += len(data)
                 await websocket.send(data)
         except Exception as e:
             logger.debug(f"SOCKS to WebSocket relay ended: {e}")
@@ -587,15 +1676,119 @@ class WebSocketToSSHProxy:
                 ssh_process = self.ssh_connections[connection_id]
                 ssh_process.terminate()
                 del self.ssh_connections[connection_id]
+                self.port_allocator.release(self.ssh_ports.pop(connection_id, None))
                 logger.debug(f"Cleaned up SSH connection: {connection_id}")
         except Exception as e:
             logger.error(f"SSH cleanup error: {e}")
             
+class DeadlineReader:
+    """rfile replacement that gives each request phase an absolute deadline
+    
+    BaseHTTPRequestHandler reads the request line and headers with readline();
+    this reader tracks which phase a line belongs to, applies the remaining
+    time as the socket timeout and enforces the header limits.
+    """
+    
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+        self.phase = 'request_line'
+        self.deadline = time.monotonic() + REQUEST_LINE_TIMEOUT
+        self.header_count = 0
+        self.header_bytes = 0
+        
+    def fill(self):
+        """Receive more data before the current phase deadline"""
+        remaining = self.deadline - time.monotonic()
+        if remaining <= 0:
+            raise RequestRejected(408, f'{self.phase}_timeouts')
+        self.sock.settimeout(remaining)
+        try:
+            data = self.sock.recv(8192)
+        except socket.timeout:
+            raise RequestRejected(408, f'{self.phase}_timeouts')
+        self.buffer += data
+        return data
+        
+    def readline(self, limit=-1):
+        """Read one line, honouring the caller's length limit"""
+        while True:
+            end = self.buffer.find(b'\n')
+            if end >= 0:
+                end += 1
+                break
+            if 0 <= limit <= len(self.buffer) or len(self.buffer) > MAX_HEADER_BYTES:
+                end = len(self.buffer)
+                break
+            if not self.fill():
+                end = len(self.buffer)
+                break
+        if limit >= 0:
+            end = min(end, limit)
+        line = bytes(self.buffer[:end])
+        del self.buffer[:end]
+        self.advance(line)
+        return line
+        
+    def read(self, size=-1):
+        """Read a request body of known size"""
+        while size < 0 or len(self.buffer) < size:
+            if not self.fill():
+                break
+        size = len(self.buffer) if size < 0 else min(size, len(self.buffer))
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+        
+    def advance(self, line):
+        """Move between phases and enforce header limits"""
+        if self.phase == 'request_line':
+            if len(line) > MAX_HEADER_BYTES:
+                raise RequestRejected(431, 'oversized_headers')
+            self.phase = 'header'
+            self.deadline = time.monotonic() + HEADER_TIMEOUT
+        elif self.phase == 'header':
+            if line in (b'\r\n', b'\n', b''):
+                self.phase = 'body'
+                self.deadline = time.monotonic() + BODY_TIMEOUT
+                return
+            self.header_count += 1
+            self.header_bytes += len(line)
+            if self.header_count > MAX_HEADERS:
+                raise RequestRejected(431, 'too_many_headers')
+            if self.header_bytes > MAX_HEADER_BYTES:
+                raise RequestRejected(431, 'oversized_headers')
+                
+    def close(self):
+        pass
+        
 class HTTPProxyHandler(BaseHTTPRequestHandler):
     """HTTP Proxy handler"""
     
+    def setup(self):
+        super().setup()
+        self.rfile = DeadlineReader(self.connection)
+        
+    def handle_one_request(self):
+        """Handle one request, closing early when the read guard rejects it"""
+        try:
+            super().handle_one_request()
+        except RequestRejected as e:
+            self.server.proxy.guard.record(e.reason)
+            self.close_connection = True
+            try:
+                self.connection.settimeout(1)
+                self.wfile.write(rejection_response(e.code))
+            except OSError:
+                pass
+                
     def do_CONNECT(self):
         """Handle CONNECT method for HTTPS tunneling"""
+        proxy = self.server.proxy
+        proxy.count('connections')
+        proxy.count('active')
+        # The tunnel is select()-driven; drop the header-phase deadline
+        self.connection.settimeout(None)
         try:
             # Parse the request
             host, port = self.path.split(':')
@@ -614,7 +1807,10 @@ class HTTPProxyHandler(BaseHTTPRequestHandler):
             
         except Exception as e:
             logger.error(f"CONNECT error: {e}")
+            proxy.count('errors')
             self.send_error(500, 'Internal Server Error')
+        finally:
+            proxy.count('active', -1)
             
     def tunnel_data(self, client_socket, target_socket):
         """Tunnel data between client and target"""
@@ -658,14 +1854,23 @@ class HTTPProxyServer:
         self.port = port
         self.server = None
         self.thread = None
+        self.stats = {'connections': 0, 'active': 0, 'errors': 0}
+        self.stats_lock = threading.Lock()
+        self.guard = ReadGuardStats()
         
-    def start(self):
+    def start(self, executor=None):
         """Start the HTTP proxy server"""
         try:
-            self.server = HTTPServer((self.host, self.port), HTTPProxyHandler)
-            self.thread = threading.Thread(target=self.server.serve_forever)
-            self.thread.daemon = True
-            self.thread.start()
+            # A thread per connection: a slow client or a long tunnel no longer blocks the port
+            self.server = ThreadingHTTPServer((self.host, self.port), HTTPProxyHandler)
+            self.server.daemon_threads = True
+            self.server.proxy = self
+            if executor:
+                executor.submit(self.server.serve_forever)
+            else:
+                self.thread = threading.Thread(target=self.server.serve_forever)
+                self.thread.daemon = True
+                self.thread.start()
             
             logger.info(f"HTTP proxy server started on {self.host}:{self.port}")
             
@@ -678,43 +1883,178 @@ class HTTPProxyServer:
             self.server.shutdown()
             self.server.server_close()
             
+    def count(self, key, delta=1):
+        """Update a connection counter from a handler thread"""
+        with self.stats_lock:
+            self.stats[key] += delta
+            
+    def get_status(self):
+        """Get listener state, CONNECT counters and read guard counters"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        return dict(stats, port=self.port, running=self.server is not None, read_guard=self.guard.snapshot())
+        
+async def benchmark_websocket_bridge(messages=5000, size=1024):
+    """Round-trip messages through the WebSocket bridge to a local echo backend"""
+    async def echo(reader, writer):
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        writer.close()
+        
+    echo_server = await asyncio.start_server(echo, '127.0.0.1', 0)
+    echo_port = echo_server.sockets[0].getsockname()[1]
+    
+    proxy = WebSocketToSSHProxy(
+        host='127.0.0.1',
+        port=0,
+        compression='off',
+        routes=[WebSocketRoute('/', 'tcp', '127.0.0.1', echo_port)]
+    )
+    await proxy.start()
+    proxy_port = proxy.server.sockets[0].getsockname()[1]
+    
+    payload = os.urandom(size)
+    async with websockets.connect(f"ws://127.0.0.1:{proxy_port}/", subprotocols=["socks"],
+                                  compression=None) as client:
+        started = time.perf_counter()
+        for _ in range(messages):
+            await client.send(payload)
+            received = 0
+            while received < size:
+                received += len(await client.recv())
+        elapsed = time.perf_counter() - started
+        
+    proxy.server.close()
+    await proxy.server.wait_closed()
+    echo_server.close()
+    await echo_server.wait_closed()
+    return {
+        'messages': messages,
+        'message_size': size,
+        'seconds': round(elapsed, 3),
+        'round_trips_per_sec': round(messages / elapsed),
+        'mb_per_sec': round(messages * size * 2 / elapsed / 1024**2, 2)
+    }
+    
+def benchmark_event_loops(messages=5000, size=1024):
+    """Compare event loop implementations on the WebSocket bridge"""
+    results = {}
+    kinds = ['asyncio'] + (['uvloop'] if uvloop is not None else [])
+    for kind in kinds:
+        loop = new_event_loop(kind)
+        try:
+            results[kind] = loop.run_until_complete(benchmark_websocket_bridge(messages, size))
+        finally:
+            loop.close()
+    return results
+    
 class MastermindProxyManager:
-    """Main proxy manager"""
+    """Main proxy manager
+    
+    Every service with an async implementation runs on one shared event loop
+    (uvloop when available); blocking services run on a thread pool of their
+    own, so the loop's default executor stays free for getaddrinfo and other
+    run_in_executor calls.
+    """
     
     def __init__(self):
         self.socks5_server = None
         self.http_servers = []
         self.websocket_proxy = None
         self.http_proxy = None
+        self.tls = None
+        self.loop = None
+        self.loop_thread = None
+        self.executor = None
         self.running = False
+        self.start_time = time.time()
+        self.status_cache = (0, b'')
         
+    def start_loop(self):
+        """Start the shared event loop and the executor for blocking services"""
+        self.loop = new_event_loop()
+        # One worker per long-running blocking service: SOCKS5 accept loop, HTTP proxy, TLS watcher
+        self.executor = ThreadPoolExecutor(
+            max_workers=3,
+            thread_name_prefix='mastermind-service'
+        )
+        self.loop_thread = threading.Thread(target=self._run_loop)
+        self.loop_thread.daemon = True
+        self.loop_thread.start()
+        logger.info(f"Event loop: {type(self.loop).__module__}.{type(self.loop).__name__}")
+        
+    def _run_loop(self):
+        """Run the shared event loop until stopped"""
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        except Exception as e:
+            logger.error(f"Event loop error: {e}")
+            
+    def run_async(self, coroutine):
+        """Schedule a coroutine on the shared event loop"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        
+    async def finish_tasks(self, timeout=2):
+        """Let closed connections unwind, then cancel whatever is still pending"""
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        
+    def run_sync(self, function):
+        """Run a blocking service on the executor"""
+        return self.executor.submit(function)
+        
+    def start_tls(self):
+        """Load the shared TLS context if any listener needs it"""
+        if not (TLS_WEBSOCKET or TLS_SOCKS):
+            return
+            
+        try:
+            self.tls = TLSContextManager()
+            self.run_sync(self.tls.watch)
+            logger.info(f"TLS enabled with certificate {TLS_CERT_FILE} (kTLS: {self.tls.ktls})")
+        except Exception as e:
+            logger.error(f"Failed to load TLS certificate, listeners stay plaintext: {e}")
+            self.tls = None
+            
     def start_all(self):
         """Start all proxy services"""
         logger.info("Starting Mastermind Proxy Suite v2.0...")
         
+        self.start_loop()
+        self.start_tls()
+        self.loop.call_soon_threadsafe(branding.watch, self.loop)
+        
         # Start SOCKS5 server
-        self.socks5_server = SOCKS5Server()
-        socks5_thread = threading.Thread(target=self.socks5_server.start)
-        socks5_thread.daemon = True
-        socks5_thread.start()
+        self.socks5_server = SOCKS5Server(tls=self.tls if TLS_SOCKS else None)
+        self.run_sync(self.socks5_server.start)
         
         # Start HTTP response servers on new ports (avoiding conflicts)
+        port_modes = parse_port_modes(RESPONSE_PORT_MODES)
         for port in RESPONSE_PORTS:
-            server = HTTPResponseServer(port)
-            server.start()
+            server = HTTPResponseServer(port, mode=port_modes.get(port, 'http'),
+                                        status_document=self.status_document)
+            self.run_async(server.start())
             self.http_servers.append(server)
             
         # Start WebSocket-to-SSH SOCKS proxy if enabled
         if ENABLE_WEBSOCKET:
-            self.websocket_proxy = WebSocketToSSHProxy()
-            ws_thread = threading.Thread(target=self._start_websocket)
-            ws_thread.daemon = True
-            ws_thread.start()
+            self.websocket_proxy = WebSocketToSSHProxy(tls=self.tls if TLS_WEBSOCKET else None)
+            self.run_async(self.websocket_proxy.start())
             
         # Start HTTP proxy if enabled
         if ENABLE_HTTP_PROXY:
             self.http_proxy = HTTPProxyServer()
-            self.http_proxy.start()
+            self.http_proxy.start(self.executor)
             
         self.running = True
         logger.info("All proxy services started successfully")
@@ -740,37 +2080,93 @@ class MastermindProxyManager:
             # Clean up all SSH connections
             for connection_id in list(self.websocket_proxy.ssh_connections.keys()):
                 self.websocket_proxy.cleanup_ssh_connection(connection_id)
+            for route in self.websocket_proxy.router.all_routes():
+                if route.pool:
+                    route.pool.close()
+            if self.websocket_proxy.server:
+                self.loop.call_soon_threadsafe(self.websocket_proxy.server.close)
             
         # Stop HTTP proxy
         if self.http_proxy:
             self.http_proxy.stop()
             
+        if self.tls:
+            self.tls.stop()
+            
+        if self.loop:
+            self.loop.call_soon_threadsafe(branding.unwatch)
+            try:
+                self.run_async(self.finish_tasks()).result(timeout=5)
+            except Exception as e:
+                logger.error(f"Error cancelling event loop tasks: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.executor:
+            self.executor.shutdown(wait=False)
+            
         logger.info("All proxy services stopped")
-        
-    def _start_websocket(self):
-        """Start WebSocket-to-SSH proxy in new event loop"""
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(self.websocket_proxy.start())
-            loop.run_forever()
-        except Exception as e:
-            logger.error(f"WebSocket-to-SSH proxy error: {e}")
             
+    def get_status(self):
+        """Aggregate in-memory counters from every service"""
+        return {
+            'status': 'online' if self.running else 'stopped',
+            'server': socket.gethostname(),
+            'service': 'Mastermind Proxy Suite',
+            'version': '2.0',
+            'timestamp': time.time(),
+            'uptime': time.time() - self.start_time,
+            'event_loop': f"{type(self.loop).__module__}.{type(self.loop).__name__}" if self.loop else None,
+            'socks5': self.socks5_server.get_status() if self.socks5_server else None,
+            'http_proxy': self.http_proxy.get_status() if self.http_proxy else None,
+            'websocket': self.websocket_proxy.get_status() if self.websocket_proxy else None,
+            'tls': self.tls.get_status() if self.tls else None,
+            'response_ports': [server.get_status() for server in self.http_servers]
+        }
+        
+    def status_document(self):
+        """Encoded get_status() JSON, rebuilt at most every STATUS_CACHE_TTL seconds"""
+        expires, body = self.status_cache
+        now = time.monotonic()
+        if now >= expires:
+            body = json.dumps(self.get_status(), indent=2).encode('utf-8')
+            self.status_cache = (now + STATUS_CACHE_TTL, body)
+        return body
+        
     def signal_handler(self, signum, frame):
         """Handle shutdown signals"""
         logger.info(f"Received signal {signum}, shutting down...")
         self.stop_all()
         sys.exit(0)
         
+    def reload_handler(self, signum, frame):
+        """Reload TLS certificates and the response message on SIGHUP"""
+        if self.tls:
+            logger.info("Received SIGHUP, reloading TLS certificate...")
+            self.tls.reload(force=True)
+        if self.loop:
+            self.loop.call_soon_threadsafe(branding.reload, True)
+            
 def main():
     """Main function"""
+    if len(sys.argv) > 1 and sys.argv[1] == 'tls-benchmark':
+        host = sys.argv[2] if len(sys.argv) > 2 else '127.0.0.1'
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else SOCKS_PORT
+        count = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+        print(json.dumps(measure_tls_latency(host, port, count), indent=2))
+        return
+        
+    if len(sys.argv) > 1 and sys.argv[1] == 'loop-benchmark':
+        messages = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+        size = int(sys.argv[3]) if len(sys.argv) > 3 else 1024
+        print(json.dumps(benchmark_event_loops(messages, size), indent=2))
+        return
+        
     # Create proxy manager
     proxy_manager = MastermindProxyManager()
     
     # Setup signal handlers
     signal.signal(signal.SIGINT, proxy_manager.signal_handler)
     signal.signal(signal.SIGTERM, proxy_manager.signal_handler)
+    signal.signal(signal.SIGHUP, proxy_manager.reload_handler)
     
     try:
         # Start all services
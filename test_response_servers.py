@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script for the branding response servers
+Checks that request data echoed into error pages is HTML-escaped
+"""
+
+import os
+import sys
+import time
+import socket
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'branding'))
+os.makedirs('/var/log/mastermind', exist_ok=True)
+os.environ.setdefault('RESPONSE_PORTS', '18311')
+
+from response_servers import ResponseServerManager
+
+PORT = int(os.environ['RESPONSE_PORTS'].split(',')[0])
+
+def send_raw(payload):
+    """Send a raw request and return the whole response"""
+    sock = socket.create_connection(('127.0.0.1', PORT), timeout=5)
+    try:
+        sock.sendall(payload)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+    finally:
+        sock.close()
+
+def test_unsupported_method_is_escaped():
+    """Test that a method containing markup is not reflected as HTML"""
+    manager = ResponseServerManager()
+    manager.start_all()
+    try:
+        time.sleep(0.3)
+        method = b'<script>alert(1)</script>'
+        response = send_raw(method + b' / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n')
+    finally:
+        manager.stop_all()
+
+    status_line, _, body = response.partition(b'\r\n')
+    assert b' 501 ' in status_line, status_line
+    assert method not in body, "method reflected unescaped"
+    assert b'&lt;script&gt;alert(1)&lt;/script&gt;' in body
+    print("✓ Unsupported method escaped in error page")
+
+def main():
+    """Run all response server tests"""
+    print("🔍 Testing response servers...")
+    test_unsupported_method_is_escaped()
+    print("\n🎉 All response server tests passed")
+
+if __name__ == "__main__":
+    main()
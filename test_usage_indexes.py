@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the usage database schema
+Checks that migrations upgrade old databases and that the hot queries use indexes
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'users'))
+os.makedirs('/var/log/mastermind', exist_ok=True)
+
+from usage_limits import UsageLimitsManager
+
+# Version 0 schema as deployed before migrations existed
+LEGACY_SCHEMA = '''
+CREATE TABLE users (
+    username TEXT PRIMARY KEY, user_type TEXT NOT NULL, data_limit_gb INTEGER DEFAULT 10,
+    days_limit INTEGER DEFAULT 30, connection_limit INTEGER DEFAULT 5,
+    created_date TEXT DEFAULT CURRENT_TIMESTAMP, expiry_date TEXT, status TEXT DEFAULT 'active'
+);
+CREATE TABLE usage_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, service_type TEXT NOT NULL,
+    bytes_used INTEGER DEFAULT 0, connections INTEGER DEFAULT 0,
+    session_start TEXT DEFAULT CURRENT_TIMESTAMP, session_end TEXT, ip_address TEXT
+);
+CREATE TABLE active_sessions (
+    session_id TEXT PRIMARY KEY, username TEXT NOT NULL, service_type TEXT NOT NULL, ip_address TEXT,
+    start_time TEXT DEFAULT CURRENT_TIMESTAMP, last_activity TEXT DEFAULT CURRENT_TIMESTAMP,
+    bytes_in INTEGER DEFAULT 0, bytes_out INTEGER DEFAULT 0
+);
+INSERT INTO users (username, user_type, expiry_date) VALUES ('legacy', 'ssh', '2030-01-01T00:00:00');
+INSERT INTO usage_logs (username, service_type, bytes_used) VALUES ('legacy', 'ssh', 4096);
+INSERT INTO active_sessions (session_id, username, service_type, bytes_in, bytes_out)
+VALUES ('legacy_ssh_1', 'legacy', 'ssh', 10, 20);
+'''
+
+# Tables whose rows grow with users and history; these must never be scanned
+INDEXED_TABLES = ('users', 'usage_logs', 'active_sessions', 'usage_daily', 'usage_hourly')
+
+def query_plan(conn, sql):
+    """Return the EXPLAIN QUERY PLAN details of an expanded statement"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()]
+
+def traced_statements(manager, action):
+    """Run action and capture the data statements it sends to SQLite"""
+    statements = []
+    conn = manager.db.get()
+    conn.set_trace_callback(statements.append)
+    try:
+        action()
+    finally:
+        conn.set_trace_callback(None)
+    return [s.strip() for s in statements
+            if s.strip().split(None, 1)[0].upper() in ('SELECT', 'INSERT', 'UPDATE', 'DELETE')]
+
+def test_migrates_legacy_database():
+    """Test that a version 0 database is upgraded in place"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'usage.db')
+        conn = sqlite3.connect(path)
+        conn.executescript(LEGACY_SCHEMA)
+        conn.close()
+
+        manager = UsageLimitsManager(path)
+        conn = manager.db.get()
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == len(manager.migrations())
+        assert conn.execute('SELECT start_ts FROM usage_logs').fetchone()[0] is not None
+        assert conn.execute("SELECT expiry_ts FROM users WHERE username = 'legacy'").fetchone()[0] is not None
+        assert manager.get_user_limits('legacy')['total_bytes_used'] == 4096 + 30
+        assert manager.end_session('legacy_ssh_1')
+        manager.close()
+
+        # Opening again must not re-run migrations
+        UsageLimitsManager(path).close()
+    print("✓ Legacy database migrated")
+
+def test_hot_queries_use_indexes():
+    """Test that admission, accounting and cleanup queries avoid full scans"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = UsageLimitsManager(os.path.join(tmpdir, 'usage.db'))
+        for i in range(50):
+            manager.add_user(f'user{i}', 'ssh')
+        session_id = manager.start_session('user1', 'ssh', '127.0.0.1')
+
+        def hot_path():
+            manager.get_user_limits('user1')
+            manager.check_user_limits('user1')
+            manager.start_session('user2', 'ssh', '127.0.0.1')
+            manager.update_session_usage(session_id, 100, 200)
+            manager.flush_usage()
+            manager.end_session(session_id)
+            manager.cleanup_old_sessions()
+            manager.disable_user('user3')
+
+        statements = traced_statements(manager, hot_path)
+        assert statements, "no statements traced"
+
+        conn = manager.db.get()
+        failures = []
+        for sql in statements:
+            for detail in query_plan(conn, sql):
+                if detail.startswith('SCAN ') and detail.split()[1] in INDEXED_TABLES:
+                    failures.append(f"{detail}: {' '.join(sql.split())}")
+        manager.close()
+
+    assert not failures, "full table scans:\n" + "\n".join(failures)
+    print(f"✓ {len(statements)} hot statements use indexes")
+
+def main():
+    """Run all schema tests"""
+    print("🔍 Testing usage database schema...")
+    test_migrates_legacy_database()
+    test_hot_queries_use_indexes()
+    print("\n🎉 All usage database tests passed")
+
+if __name__ == "__main__":
+    main()
@@ -57,7 +57,7 @@ log_action() {
 
 # 1. Stop and disable all services
 log_action "Stopping and disabling services..."
-services=("python-proxy" "v2ray" "dropbear" "squid" "openvpn" "nginx")
+services=("python-proxy" "usage-limits" "v2ray" "dropbear" "squid" "openvpn" "nginx")
 for service in "${services[@]}"; do
     if systemctl is-active --quiet "$service" 2>/dev/null; then
         systemctl stop "$service" 2>/dev/null || true
@@ -73,6 +73,7 @@ done
 log_action "Removing systemd service files..."
 service_files=(
     "/etc/systemd/system/python-proxy.service"
+    "/etc/systemd/system/usage-limits.service"
     "/etc/systemd/system/mastermind-proxy.service"
     "/etc/systemd/system/mastermind-v2ray.service"
     "/etc/systemd/system/mastermind-monitor.service"
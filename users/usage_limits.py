@@ -8,15 +8,69 @@ Tracks data usage, connection limits, and time-based restrictions.
 """
 
 import os
+import re
 import sys
+import csv
+import pwd
 import json
+import argparse
 import time
+import signal
+import socket
 import sqlite3
-import subprocess
+import tempfile
+import threading
+import socketserver
+import heapq
 import logging
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
+# Configuration
+DB_PATH = os.getenv('USAGE_DB_PATH', '/var/lib/mastermind/usage.db')
+DB_BUSY_TIMEOUT = int(os.getenv('USAGE_DB_BUSY_TIMEOUT', '5000'))  # ms a writer waits for the lock
+DB_SYNCHRONOUS = os.getenv('USAGE_DB_SYNCHRONOUS', 'NORMAL')  # NORMAL is durable per checkpoint in WAL mode
+DB_CACHE_SIZE_KB = int(os.getenv('USAGE_DB_CACHE_SIZE_KB', '8192'))  # page cache per connection
+DB_MMAP_SIZE = int(os.getenv('USAGE_DB_MMAP_SIZE', str(64 * 1024 * 1024)))  # bytes of the file mapped
+DB_STATEMENT_CACHE = int(os.getenv('USAGE_DB_STATEMENT_CACHE', '128'))  # prepared statements per connection
+FLUSH_INTERVAL = float(os.getenv('USAGE_FLUSH_INTERVAL', '5'))  # max seconds of accounting lost on crash
+FLUSH_THRESHOLD = int(os.getenv('USAGE_FLUSH_THRESHOLD', '1000'))  # pending sessions that force an early flush
+USAGE_WINDOW_DAYS = int(os.getenv('USAGE_WINDOW_DAYS', '30'))  # data limit window, in daily buckets
+HOURLY_RETENTION_HOURS = int(os.getenv('USAGE_HOURLY_RETENTION_HOURS', '48'))  # hourly buckets kept by cleanup
+ADMISSION_CACHE_TTL = float(os.getenv('USAGE_ADMISSION_CACHE_TTL', '5'))  # seconds a limits lookup is reused, 0 disables
+ADMISSION_CACHE_ENTRIES = int(os.getenv('USAGE_ADMISSION_CACHE_ENTRIES', '10000'))
+EXPIRY_MAX_SLEEP = float(os.getenv('USAGE_EXPIRY_MAX_SLEEP', '60'))  # cap on one scheduler sleep, absorbs clock jumps
+ENFORCE_INTERVAL = float(os.getenv('USAGE_ENFORCE_INTERVAL', '0'))  # seconds between daemon sweeps; off by default, expiry is scheduled
+REPORT_PAGE_SIZE = int(os.getenv('USAGE_REPORT_PAGE_SIZE', '500'))  # users fetched per report query
+BULK_CHUNK_SIZE = int(os.getenv('USAGE_BULK_CHUNK_SIZE', '500'))  # rows per bulk transaction
+USAGE_SOCKET = os.getenv('USAGE_SOCKET', '/run/mastermind/usage-limits.sock')
+USAGE_CLIENT_TIMEOUT = float(os.getenv('USAGE_CLIENT_TIMEOUT', '5'))
+
+# Manager methods callable over the daemon socket
+RPC_METHODS = (
+    'add_user', 'get_user_limits', 'check_user_limits', 'get_hourly_usage',
+    'start_session', 'end_session', 'update_session_usage', 'flush_usage',
+    'disable_user', 'get_usage_report', 'cleanup_old_sessions', 'bulk_from_file',
+    'enforce_limits'
+)
+
+# Columns of a usage report row
+REPORT_FIELDS = (
+    'username', 'user_type', 'data_limit_gb', 'expiry_date', 'status',
+    'total_bytes', 'total_sessions', 'active_sessions', 'data_used_gb'
+)
+
+# Column order of headerless CSV input for each bulk operation
+BULK_FIELDS = {
+    'import': ('username', 'user_type', 'data_gb', 'days', 'connections'),
+    'extend': ('username', 'days'),
+    'limits': ('username', 'data_gb', 'connections'),
+    'disable': ('username',)
+}
+# Other names accepted for a field in CSV headers and JSON keys
+BULK_ALIASES = {'type': 'user_type'}
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -28,13 +82,311 @@ logging.basicConfig(
 )
 logger = logging.getLogger('usage-limits')
 
+def read_records(path, fields):
+    """Stream (line, record) pairs from a CSV or JSON lines file
+    
+    CSV files may start with a header row naming the fields (BULK_ALIASES
+    apply); otherwise columns follow the given field order. A record that
+    cannot be parsed is yielded as the exception instead of a dict.
+    """
+    with open(path, newline='') as f:
+        header = None
+        for number, line in enumerate(f, 1):
+            text = line.strip()
+            if not text or text.startswith('#'):
+                continue
+            if text.startswith('{'):
+                try:
+                    record = json.loads(text)
+                except ValueError as e:
+                    yield number, e
+                    continue
+                if isinstance(record, dict):
+                    record = {BULK_ALIASES.get(key, key): value for key, value in record.items()}
+                yield number, record
+                continue
+            row = [cell.strip() for cell in next(csv.reader([text]))]
+            if header is None and row[0].lower() == 'username':
+                header = [BULK_ALIASES.get(cell.lower(), cell.lower()) for cell in row]
+                continue
+            yield number, dict(zip(header or fields, row))
+
+class ConnectionManager:
+    """Thread-local persistent SQLite connections
+    
+    Each thread keeps one tuned connection in WAL mode, so prepared statements
+    stay cached and readers never block the writer; busy_timeout makes
+    concurrent writers from the proxy and the CLI wait instead of failing
+    with "database is locked". persistent=False reproduces the old
+    connect-per-call behaviour for benchmarking.
+    """
+    
+    def __init__(self, db_path=DB_PATH, persistent=True):
+        self.db_path = db_path
+        self.persistent = persistent
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        
+    def connect(self):
+        """Open a connection with the tuned pragmas applied"""
+        conn = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT / 1000,
+                               cached_statements=DB_STATEMENT_CACHE)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={DB_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+        conn.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+        
+    def get(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+        
+    @contextmanager
+    def transaction(self):
+        """Yield a connection; commit on success, roll back on error"""
+        if not self.persistent:
+            conn = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT / 1000)
+            try:
+                yield conn
+                conn.commit()
+            finally:
+                conn.close()
+            return
+            
+        conn = self.get()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+            
+    def close(self):
+        """Close every connection opened through this manager"""
+        with self.lock:
+            for conn in self.connections:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # Opened by another thread that is still running; it closes with the thread
+                    pass
+            self.connections = []
+        self.local = threading.local()
+        
+    def release(self):
+        """Close the calling thread's connection, e.g. before the thread exits"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            return
+        with self.lock:
+            if conn in self.connections:
+                self.connections.remove(conn)
+        self.local.conn = None
+        conn.close()
+        
+class UsageBuffer:
+    """Write-back cache of per-session byte counters
+    
+    record() is a dict update under a lock; a background thread writes the
+    accumulated deltas with one executemany transaction every FLUSH_INTERVAL
+    seconds, or sooner once FLUSH_THRESHOLD sessions are pending.
+    """
+    
+    def __init__(self, db, interval=FLUSH_INTERVAL, threshold=FLUSH_THRESHOLD):
+        self.db = db
+        self.interval = interval
+        self.threshold = threshold
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self.stats = {'flushes': 0, 'rows': 0, 'errors': 0}
+        
+    def record(self, session_id, bytes_in, bytes_out):
+        """Add a byte delta for a session"""
+        with self.lock:
+            entry = self.pending.get(session_id)
+            if entry is None:
+                self.pending[session_id] = [bytes_in, bytes_out, time.time()]
+            else:
+                entry[0] += bytes_in
+                entry[1] += bytes_out
+                entry[2] = time.time()
+            size = len(self.pending)
+            if self.thread is None and not self.stopping:
+                self.thread = threading.Thread(target=self.run, name='usage-flush', daemon=True)
+                self.thread.start()
+        if size >= self.threshold:
+            self.wake.set()
+            
+    def take(self, session_id):
+        """Remove and return the pending delta of one session"""
+        with self.lock:
+            return self.pending.pop(session_id, None)
+            
+    def apply(self, cursor, rows):
+        """Write (session_id, [in, out, ts]) deltas and their rollups with the given cursor"""
+        rows = list(rows)
+        rollup = [(d[0] + d[1], int(d[2]), sid) for sid, d in rows]
+        cursor.executemany('''
+            INSERT INTO usage_daily (username, day, bytes_used, sessions)
+            SELECT username, date(?2, 'unixepoch'), ?1, 0 FROM active_sessions WHERE session_id = ?3
+            ON CONFLICT (username, day) DO UPDATE SET bytes_used = bytes_used + excluded.bytes_used
+        ''', rollup)
+        cursor.executemany('''
+            INSERT INTO usage_hourly (username, hour, bytes_used, sessions)
+            SELECT username, strftime('%Y-%m-%d %H', ?2, 'unixepoch'), ?1, 0
+            FROM active_sessions WHERE session_id = ?3
+            ON CONFLICT (username, hour) DO UPDATE SET bytes_used = bytes_used + excluded.bytes_used
+        ''', rollup)
+        cursor.executemany('''
+            UPDATE active_sessions
+            SET bytes_in = bytes_in + ?, bytes_out = bytes_out + ?,
+                last_activity = datetime(?3, 'unixepoch'), last_activity_ts = ?3
+            WHERE session_id = ?4
+        ''', [(d[0], d[1], int(d[2]), sid) for sid, d in rows])
+        
+    def flush(self):
+        """Write every pending delta in one transaction"""
+        if not self.pending:
+            return 0
+        batch = {}
+        try:
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+                # Empty the buffer only once the write lock is held; end_session takes the
+                # lock before take(), so it cannot miss a delta popped here but not yet committed
+                cursor.execute('BEGIN IMMEDIATE')
+                with self.lock:
+                    batch, self.pending = self.pending, {}
+                self.apply(cursor, batch.items())
+        except Exception as e:
+            # Put the deltas back so the next flush retries them
+            with self.lock:
+                for sid, d in batch.items():
+                    entry = self.pending.setdefault(sid, [0, 0, d[2]])
+                    entry[0] += d[0]
+                    entry[1] += d[1]
+                    entry[2] = max(entry[2], d[2])
+            self.stats['errors'] += 1
+            logger.error(f"Error flushing usage counters: {e}")
+            return 0
+        self.stats['flushes'] += 1
+        self.stats['rows'] += len(batch)
+        return len(batch)
+        
+    def run(self):
+        """Flush loop of the background thread"""
+        try:
+            while not self.stopping:
+                self.wake.wait(self.interval)
+                self.wake.clear()
+                self.flush()
+        finally:
+            self.db.release()
+            
+    def close(self):
+        """Stop the flush thread and write what is left"""
+        with self.lock:
+            self.stopping = True
+            thread = self.thread
+        self.wake.set()
+        if thread is not None:
+            thread.join()
+        self.flush()
+        
+class AdmissionCache:
+    """Per-user limits and usage reused for a short TTL
+    
+    User changes invalidate the entry; session start/end adjust the cached
+    active-session count in place so clients reconnecting in a loop keep
+    hitting the cache. Byte usage refreshes with the TTL.
+    """
+    
+    def __init__(self, ttl=ADMISSION_CACHE_TTL, max_entries=ADMISSION_CACHE_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        
+    def get(self, username):
+        """Return the cached user info, or None when missing or stale"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+            
+    def put(self, username, info):
+        """Cache user info for the TTL"""
+        if self.ttl <= 0:
+            return
+        with self.lock:
+            if username not in self.entries and len(self.entries) >= self.max_entries:
+                # Drop the oldest insertion
+                del self.entries[next(iter(self.entries))]
+            self.entries[username] = (time.monotonic() + self.ttl, info)
+            
+    def adjust_sessions(self, username, delta):
+        """Apply a session start (+1) or end (-1) to a cached entry"""
+        with self.lock:
+            entry = self.entries.get(username)
+            if entry is not None:
+                entry[1]['active_sessions'] = max(0, entry[1]['active_sessions'] + delta)
+                
+    def invalidate(self, username=None):
+        """Forget one user, or everyone"""
+        with self.lock:
+            if username is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(username, None)
+            self.invalidations += 1
+            
+    def stats(self):
+        """Return hit/miss counters"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+        
 class UsageLimitsManager:
     """Manages user usage limits and tracking"""
     
-    def __init__(self, db_path='/var/lib/mastermind/usage.db'):
+    def __init__(self, db_path=DB_PATH, persistent=True):
         self.db_path = db_path
         self.ensure_db_directory()
+        self.db = ConnectionManager(db_path, persistent)
+        self.usage = UsageBuffer(self.db)
+        self.admission = AdmissionCache()
+        # Called with [(username, expiry_ts)] whenever an expiry is set
+        self.on_expiry = None
         self.init_database()
+        
+    def close(self):
+        """Flush buffered usage and close database connections"""
+        self.usage.close()
+        self.db.close()
     
     def ensure_db_directory(self):
         """Ensure database directory exists"""
@@ -42,10 +394,52 @@ class UsageLimitsManager:
         if not os.path.exists(db_dir):
             os.makedirs(db_dir, mode=0o755)
     
+    def migrations(self):
+        """Schema migrations in order; PRAGMA user_version counts those applied"""
+        return [self.migrate_base_schema, self.migrate_epoch_indexes]
+    
     def init_database(self):
-        """Initialize SQLite database with tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Initialize SQLite database and apply pending migrations"""
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            # Take the write lock first so concurrent processes migrate once
+            cursor.execute('BEGIN IMMEDIATE')
+            version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            for number, migration in enumerate(self.migrations(), 1):
+                if number <= version:
+                    continue
+                migration(cursor)
+                cursor.execute(f'PRAGMA user_version = {number}')
+                logger.info(f"Applied usage database migration {number}: {migration.__name__}")
+        logger.info("Database initialized successfully")
+        
+    def migrate_base_schema(self, cursor):
+        """Migration 1: base tables and usage rollups"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usage_daily'")
+        has_rollups = cursor.fetchone() is not None
+        self.create_tables(cursor)
+        if not has_rollups:
+            self.backfill_rollups(cursor)
+        
+    def migrate_epoch_indexes(self, cursor):
+        """Migration 2: integer epoch columns and indexes for the hot queries"""
+        # Text timestamps stay for reports; range scans use the epoch copies
+        for table, column, source in (('users', 'expiry_ts', "strftime('%s', expiry_date, 'utc')"),
+                                      ('active_sessions', 'start_ts', "strftime('%s', start_time)"),
+                                      ('active_sessions', 'last_activity_ts', "strftime('%s', last_activity)"),
+                                      ('usage_logs', 'start_ts', "strftime('%s', session_start)"),
+                                      ('usage_logs', 'end_ts', "strftime('%s', session_end)")):
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER')
+            cursor.execute(f'UPDATE {table} SET {column} = CAST({source} AS INTEGER)')
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_status_expiry ON users (status, expiry_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_active_sessions_username ON active_sessions (username)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_active_sessions_activity ON active_sessions (last_activity_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_usage_logs_username_start ON usage_logs (username, start_ts)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_usage_hourly_hour ON usage_hourly (hour)')
+        
+    def create_tables(self, cursor):
+        """Create the version 1 schema if it does not exist yet"""
         
         # Users table with limits
         cursor.execute('''
@@ -91,27 +485,63 @@ class UsageLimitsManager:
             )
         ''')
         
-        conn.commit()
-        conn.close()
-        logger.info("Database initialized successfully")
-    
+        # Rolling usage buckets, maintained as usage is accounted
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS usage_daily (
+                username TEXT NOT NULL,
+                day TEXT NOT NULL,
+                bytes_used INTEGER DEFAULT 0,
+                sessions INTEGER DEFAULT 0,
+                PRIMARY KEY (username, day)
+            ) WITHOUT ROWID
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS usage_hourly (
+                username TEXT NOT NULL,
+                hour TEXT NOT NULL,
+                bytes_used INTEGER DEFAULT 0,
+                sessions INTEGER DEFAULT 0,
+                PRIMARY KEY (username, hour)
+            ) WITHOUT ROWID
+        ''')
+        
+    def backfill_rollups(self, cursor):
+        """Build the rollup buckets from existing logs and live sessions"""
+        for table, bucket in (('usage_daily', "date(%s)"), ('usage_hourly', "strftime('%%Y-%%m-%%d %%H', %s)")):
+            cursor.execute(f'''
+                INSERT INTO {table}
+                SELECT username, bucket, SUM(bytes_used), SUM(sessions) FROM (
+                    SELECT username, {bucket % 'session_start'} AS bucket,
+                           bytes_used, 1 AS sessions
+                    FROM usage_logs
+                    UNION ALL
+                    SELECT username, {bucket % 'last_activity'}, bytes_in + bytes_out, 0
+                    FROM active_sessions
+                )
+                WHERE bucket IS NOT NULL
+                GROUP BY username, bucket
+            ''')
+        logger.info("Usage rollups backfilled")
+
     def add_user(self, username: str, user_type: str, data_limit_gb: int = 10, 
                  days_limit: int = 30, connection_limit: int = 5) -> bool:
         """Add new user with limits"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
             
-            expiry_date = (datetime.now() + timedelta(days=days_limit)).isoformat()
+                expiry = datetime.now() + timedelta(days=days_limit)
             
-            cursor.execute('''
-                INSERT OR REPLACE INTO users 
-                (username, user_type, data_limit_gb, days_limit, connection_limit, expiry_date)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (username, user_type, data_limit_gb, days_limit, connection_limit, expiry_date))
+                cursor.execute('''
+                    INSERT OR REPLACE INTO users 
+                    (username, user_type, data_limit_gb, days_limit, connection_limit, expiry_date, expiry_ts)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (username, user_type, data_limit_gb, days_limit, connection_limit,
+                      expiry.isoformat(), int(expiry.timestamp())))
             
-            conn.commit()
-            conn.close()
+            self.admission.invalidate(username)
+            self.notify_expiry([(username, int(expiry.timestamp()))])
             logger.info(f"User {username} added with limits: {data_limit_gb}GB, {days_limit} days, {connection_limit} connections")
             return True
         except Exception as e:
@@ -121,35 +551,33 @@ class UsageLimitsManager:
     def get_user_limits(self, username: str) -> Optional[Dict]:
         """Get user limits and current usage"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
             
-            # Get user info
-            cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-            user = cursor.fetchone()
+                # Get user info
+                cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
+                user = cursor.fetchone()
             
-            if not user:
-                conn.close()
-                return None
+                if not user:
+                    return None
             
-            # Get usage statistics
-            cursor.execute('''
-                SELECT 
-                    SUM(bytes_used) as total_bytes,
-                    COUNT(*) as total_sessions
-                FROM usage_logs 
-                WHERE username = ? AND session_start >= datetime('now', '-30 days')
-            ''', (username,))
+                # Get usage statistics from at most USAGE_WINDOW_DAYS daily buckets
+                cursor.execute('''
+                    SELECT 
+                        SUM(bytes_used) as total_bytes,
+                        SUM(sessions) as total_sessions
+                    FROM usage_daily 
+                    WHERE username = ? AND day > date('now', ?)
+                ''', (username, f'-{USAGE_WINDOW_DAYS} days'))
             
-            usage = cursor.fetchone()
+                usage = cursor.fetchone()
             
-            # Get active sessions count
-            cursor.execute('''
-                SELECT COUNT(*) FROM active_sessions WHERE username = ?
-            ''', (username,))
-            active_sessions = cursor.fetchone()[0]
+                # Get active sessions count
+                cursor.execute('''
+                    SELECT COUNT(*) FROM active_sessions WHERE username = ?
+                ''', (username,))
+                active_sessions = cursor.fetchone()[0]
             
-            conn.close()
             
             return {
                 'username': user[0],
@@ -159,6 +587,7 @@ class UsageLimitsManager:
                 'connection_limit': user[4],
                 'created_date': user[5],
                 'expiry_date': user[6],
+                'expiry_ts': user[8],
                 'status': user[7],
                 'total_bytes_used': usage[0] or 0,
                 'total_sessions': usage[1] or 0,
@@ -169,16 +598,34 @@ class UsageLimitsManager:
             logger.error(f"Error getting user limits for {username}: {e}")
             return None
     
+    def get_hourly_usage(self, username: str, hours: int = 24) -> List[Dict]:
+        """Get per-hour usage buckets for the last hours"""
+        try:
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT hour, bytes_used, sessions FROM usage_hourly
+                    WHERE username = ? AND hour > strftime('%Y-%m-%d %H', 'now', ?)
+                    ORDER BY hour
+                ''', (username, f'-{hours} hours'))
+                return [{'hour': row[0], 'bytes_used': row[1], 'sessions': row[2]}
+                        for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error getting hourly usage for {username}: {e}")
+            return []
+    
     def check_user_limits(self, username: str) -> Tuple[bool, str]:
         """Check if user has exceeded limits"""
-        user_info = self.get_user_limits(username)
-        if not user_info:
-            return False, "User not found"
+        user_info = self.admission.get(username)
+        if user_info is None:
+            user_info = self.get_user_limits(username)
+            if not user_info:
+                return False, "User not found"
+            self.admission.put(username, user_info)
         
         # Check if account is expired
-        if user_info['expiry_date']:
-            expiry = datetime.fromisoformat(user_info['expiry_date'])
-            if datetime.now() > expiry:
+        if user_info['expiry_ts'] is not None:
+            if time.time() > user_info['expiry_ts']:
                 self.disable_user(username)
                 return False, "Account expired"
         
@@ -206,19 +653,19 @@ class UsageLimitsManager:
             return None
         
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
             
-            session_id = f"{username}_{service_type}_{int(time.time())}"
+                now = int(time.time())
+                session_id = f"{username}_{service_type}_{now}"
             
-            cursor.execute('''
-                INSERT INTO active_sessions 
-                (session_id, username, service_type, ip_address)
-                VALUES (?, ?, ?, ?)
-            ''', (session_id, username, service_type, ip_address))
+                cursor.execute('''
+                    INSERT INTO active_sessions 
+                    (session_id, username, service_type, ip_address, start_ts, last_activity_ts)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (session_id, username, service_type, ip_address, now, now))
             
-            conn.commit()
-            conn.close()
+            self.admission.adjust_sessions(username, 1)
             logger.info(f"Session started for {username}: {session_id}")
             return session_id
         except Exception as e:
@@ -227,68 +674,78 @@ class UsageLimitsManager:
     
     def end_session(self, session_id: str) -> bool:
         """End user session and log usage"""
+        pending = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+                
+                # Write buffered counters first so the log entry is complete; the write
+                # lock serialises this with a concurrent UsageBuffer.flush
+                cursor.execute('BEGIN IMMEDIATE')
+                pending = self.usage.take(session_id)
+                if pending:
+                    self.usage.apply(cursor, [(session_id, pending)])
             
-            # Get session info
-            cursor.execute('SELECT * FROM active_sessions WHERE session_id = ?', (session_id,))
-            session = cursor.fetchone()
+                # Get session info
+                cursor.execute('''
+                    SELECT username, service_type, ip_address, start_time, start_ts, bytes_in + bytes_out
+                    FROM active_sessions WHERE session_id = ?
+                ''', (session_id,))
+                session = cursor.fetchone()
             
-            if not session:
-                conn.close()
-                return False
+                if not session:
+                    return False
             
-            # Log usage
-            cursor.execute('''
-                INSERT INTO usage_logs 
-                (username, service_type, bytes_used, connections, session_start, session_end, ip_address)
-                VALUES (?, ?, ?, 1, ?, CURRENT_TIMESTAMP, ?)
-            ''', (session[1], session[2], session[6] + session[7], session[4], session[8]))
+                # Log usage
+                cursor.execute('''
+                    INSERT INTO usage_logs 
+                    (username, service_type, bytes_used, connections, session_start, session_end,
+                     ip_address, start_ts, end_ts)
+                    VALUES (?, ?, ?, 1, ?, CURRENT_TIMESTAMP, ?, ?, ?)
+                ''', (session[0], session[1], session[5], session[3], session[2], session[4], int(time.time())))
             
-            # Remove from active sessions
-            cursor.execute('DELETE FROM active_sessions WHERE session_id = ?', (session_id,))
+                # Count the session in the current buckets
+                for table, column, bucket in (('usage_daily', 'day', "date('now')"),
+                                              ('usage_hourly', 'hour', "strftime('%Y-%m-%d %H', 'now')")):
+                    cursor.execute(f'''
+                        INSERT INTO {table} (username, {column}, bytes_used, sessions)
+                        VALUES (?, {bucket}, 0, 1)
+                        ON CONFLICT (username, {column}) DO UPDATE SET sessions = sessions + 1
+                    ''', (session[0],))
             
-            conn.commit()
-            conn.close()
+                # Remove from active sessions
+                cursor.execute('DELETE FROM active_sessions WHERE session_id = ?', (session_id,))
+            
+            self.admission.adjust_sessions(session[0], -1)
             logger.info(f"Session ended: {session_id}")
             return True
         except Exception as e:
+            if pending:
+                self.usage.record(session_id, pending[0], pending[1])
             logger.error(f"Error ending session {session_id}: {e}")
             return False
     
     def update_session_usage(self, session_id: str, bytes_in: int, bytes_out: int) -> bool:
-        """Update session data usage"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE active_sessions 
-                SET bytes_in = bytes_in + ?, bytes_out = bytes_out + ?, last_activity = CURRENT_TIMESTAMP
-                WHERE session_id = ?
-            ''', (bytes_in, bytes_out, session_id))
-            
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            logger.error(f"Error updating session usage {session_id}: {e}")
-            return False
+        """Buffer session data usage; written by the next flush"""
+        self.usage.record(session_id, bytes_in, bytes_out)
+        return True
+        
+    def flush_usage(self) -> int:
+        """Write buffered session usage now"""
+        return self.usage.flush()
     
     def disable_user(self, username: str) -> bool:
         """Disable user account"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute('UPDATE users SET status = ? WHERE username = ?', ('disabled', username))
+                cursor.execute('UPDATE users SET status = ? WHERE username = ?', ('disabled', username))
             
-            # End all active sessions
-            cursor.execute('DELETE FROM active_sessions WHERE username = ?', (username,))
+                # End all active sessions
+                cursor.execute('DELETE FROM active_sessions WHERE username = ?', (username,))
             
-            conn.commit()
-            conn.close()
+            self.admission.invalidate(username)
             
             # Kill user processes
             self.kill_user_processes(username)
@@ -298,87 +755,789 @@ class UsageLimitsManager:
             logger.error(f"Error disabling user {username}: {e}")
             return False
     
-    def kill_user_processes(self, username: str):
-        """Kill all processes for disabled user"""
+    def bulk_from_file(self, operation: str, path: str) -> Dict:
+        """Apply a bulk operation to every record of a CSV or JSON lines file"""
+        operations = {
+            'import': (self.prepare_import, self.apply_import, self.after_import),
+            'extend': (self.prepare_extend, self.apply_extend, None),
+            'limits': (self.prepare_limits, self.apply_limits, None),
+            'disable': (self.prepare_disable, self.apply_disable, self.after_disable)
+        }
+        if operation not in operations:
+            raise ValueError(f"Unknown bulk operation: {operation}")
+        
+        prepare, apply, after = operations[operation]
+        report = {'operation': operation, 'processed': 0, 'applied': 0, 'errors': []}
+        chunk = []
+        for line, record in read_records(path, BULK_FIELDS[operation]):
+            report['processed'] += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                chunk.append((line, prepare(record)))
+            except (KeyError, ValueError, TypeError) as e:
+                report['errors'].append({'line': line, 'error': f"{type(e).__name__}: {e}"})
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                self.write_bulk_chunk(chunk, apply, after, report)
+                chunk = []
+        if chunk:
+            self.write_bulk_chunk(chunk, apply, after, report)
+        report['errors'].sort(key=lambda error: error['line'])
+        
+        logger.info(f"Bulk {operation} from {path}: {report['applied']}/{report['processed']} applied, "
+                    f"{len(report['errors'])} errors")
+        return report
+        
+    def write_bulk_chunk(self, chunk, apply, after, report):
+        """Write one chunk in a transaction, isolating bad rows on failure"""
+        rows = [params for _, params in chunk]
         try:
-            # Kill SSH sessions
-            subprocess.run(['pkill', '-u', username], check=False)
+            with self.db.transaction() as conn:
+                failed = apply(conn.cursor(), rows)
+        except sqlite3.Error as e:
+            if len(chunk) == 1:
+                report['errors'].append({'line': chunk[0][0], 'error': str(e)})
+                return
+            # Retry row by row so one bad record does not sink the chunk
+            for item in chunk:
+                self.write_bulk_chunk([item], apply, after, report)
+            return
+        
+        self.admission.invalidate()
+        applied = []
+        for index, (line, params) in enumerate(chunk):
+            if index in failed:
+                report['errors'].append({'line': line, 'error': failed[index]})
+            else:
+                applied.append(params)
+        report['applied'] += len(applied)
+        if after and applied:
+            after(applied)
+            
+    def missing_users(self, cursor, usernames):
+        """Return {index: error} for usernames not in the users table"""
+        placeholders = ','.join('?' * len(usernames))
+        cursor.execute(f'SELECT username FROM users WHERE username IN ({placeholders})', usernames)
+        known = {row[0] for row in cursor.fetchall()}
+        return {i: f"Unknown user: {name}" for i, name in enumerate(usernames) if name not in known}
+        
+    def bulk_username(self, record):
+        """Validated username of a bulk record"""
+        username = str(record['username']).strip()
+        if not username:
+            raise ValueError("empty username")
+        return username
+        
+    def prepare_import(self, record):
+        """Row parameters for bulk import"""
+        days = int(record.get('days') or 30)
+        data_gb = int(record.get('data_gb') or 10)
+        connections = int(record.get('connections') or 5)
+        if days <= 0:
+            raise ValueError("days must be positive")
+        if data_gb < 0 or connections < 0:
+            raise ValueError("limits must not be negative")
+        expiry = datetime.now() + timedelta(days=days)
+        return (self.bulk_username(record), record.get('user_type') or 'ssh',
+                data_gb, days, connections, expiry.isoformat(), int(expiry.timestamp()))
+        
+    def apply_import(self, cursor, rows):
+        """Insert or replace users"""
+        cursor.executemany('''
+            INSERT OR REPLACE INTO users 
+            (username, user_type, data_limit_gb, days_limit, connection_limit, expiry_date, expiry_ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        return {}
+        
+    def after_import(self, rows):
+        """Schedule the expiry of imported users"""
+        self.notify_expiry([(row[0], row[6]) for row in rows])
+        
+    def prepare_extend(self, record):
+        """Row parameters for bulk expiry extension"""
+        days = int(record['days'])
+        if days <= 0:
+            raise ValueError("days must be positive")
+        return (self.bulk_username(record), days)
+        
+    def apply_extend(self, cursor, rows):
+        """Push expiry out by the given days, counting from now when already expired"""
+        failed = self.missing_users(cursor, [row[0] for row in rows])
+        now = int(time.time())
+        cursor.executemany('''
+            UPDATE users SET
+                expiry_ts = MAX(COALESCE(expiry_ts, 0), ?1) + ?2 * 86400,
+                expiry_date = strftime('%Y-%m-%dT%H:%M:%S', MAX(COALESCE(expiry_ts, 0), ?1) + ?2 * 86400,
+                                       'unixepoch', 'localtime'),
+                days_limit = days_limit + ?2
+            WHERE username = ?3
+        ''', [(now, days, username) for i, (username, days) in enumerate(rows) if i not in failed])
+        return failed
+        
+    def prepare_limits(self, record):
+        """Row parameters for bulk limit changes; empty fields keep their value"""
+        data_gb = record.get('data_gb')
+        connections = record.get('connections')
+        data_gb = int(data_gb) if data_gb not in (None, '') else None
+        connections = int(connections) if connections not in (None, '') else None
+        if data_gb is None and connections is None:
+            raise ValueError("no limits given")
+        if (data_gb or 0) < 0 or (connections or 0) < 0:
+            raise ValueError("limits must not be negative")
+        return (self.bulk_username(record), data_gb, connections)
+        
+    def apply_limits(self, cursor, rows):
+        """Update data and connection limits"""
+        failed = self.missing_users(cursor, [row[0] for row in rows])
+        cursor.executemany('''
+            UPDATE users SET
+                data_limit_gb = COALESCE(?, data_limit_gb),
+                connection_limit = COALESCE(?, connection_limit)
+            WHERE username = ?
+        ''', [(data_gb, connections, username)
+              for i, (username, data_gb, connections) in enumerate(rows) if i not in failed])
+        return failed
+        
+    def prepare_disable(self, record):
+        """Row parameters for bulk disable"""
+        return (self.bulk_username(record),)
+        
+    def apply_disable(self, cursor, rows):
+        """Disable users and drop their sessions"""
+        failed = self.missing_users(cursor, [row[0] for row in rows])
+        rows = [row for i, row in enumerate(rows) if i not in failed]
+        cursor.executemany("UPDATE users SET status = 'disabled' WHERE username = ?", rows)
+        cursor.executemany('DELETE FROM active_sessions WHERE username = ?', rows)
+        return failed
+        
+    def after_disable(self, rows):
+        """Kill processes of disabled users once the chunk is committed"""
+        self.kill_users_processes([username for (username,) in rows])
+    
+    def notify_expiry(self, entries):
+        """Pass new expiry times to the scheduler, if one is attached"""
+        if self.on_expiry:
+            self.on_expiry(entries)
             
-            # Kill V2Ray connections (if using process tracking)
-            subprocess.run(['pkill', '-f', f'v2ray.*{username}'], check=False)
+    def get_expiry_schedule(self) -> List[Tuple[str, int]]:
+        """Return (username, expiry_ts) of every active account that expires"""
+        with self.db.transaction() as conn:
+            return conn.execute('''
+                SELECT username, expiry_ts FROM users
+                WHERE status = 'active' AND expiry_ts IS NOT NULL
+            ''').fetchall()
             
-            logger.info(f"Killed processes for user {username}")
+    def expire_users(self, usernames: List[str]) -> Tuple[List[str], List[Tuple[str, int]]]:
+        """Disable the given users that are due, in one transaction
+        
+        Returns the users disabled and (username, expiry_ts) of those that
+        were extended in the meantime and are not due yet.
+        """
+        now = int(time.time())
+        due, later = [], []
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
+            for i in range(0, len(usernames), BULK_CHUNK_SIZE):
+                chunk = usernames[i:i + BULK_CHUNK_SIZE]
+                cursor.execute(f'''
+                    SELECT username, expiry_ts FROM users
+                    WHERE status = 'active' AND expiry_ts IS NOT NULL
+                    AND username IN ({','.join('?' * len(chunk))})
+                ''', chunk)
+                for username, expiry_ts in cursor.fetchall():
+                    if expiry_ts <= now:
+                        due.append((username,))
+                    else:
+                        later.append((username, expiry_ts))
+            cursor.executemany("UPDATE users SET status = 'disabled' WHERE username = ?", due)
+            cursor.executemany('DELETE FROM active_sessions WHERE username = ?', due)
+        
+        for (username,) in due:
+            self.admission.invalidate(username)
+        self.kill_users_processes([username for (username,) in due])
+        if due:
+            logger.info(f"Expired {len(due)} accounts: {', '.join(u for (u,) in due)}")
+        return [u for (u,) in due], later
+    
+    def enforce_limits(self) -> Dict:
+        """Disable every expired or over-quota account in one pass"""
+        started = time.perf_counter()
+        self.usage.flush()
+        now = int(time.time())
+        try:
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT u.username,
+                           CASE WHEN u.expiry_ts <= ? THEN 'expired' ELSE 'over_quota' END
+                    FROM users u
+                    LEFT JOIN (
+                        SELECT username, SUM(bytes_used) AS bytes_used FROM usage_daily
+                        WHERE day > date('now', ?) GROUP BY username
+                    ) d ON d.username = u.username
+                    WHERE u.status = 'active'
+                    AND (u.expiry_ts <= ? OR COALESCE(d.bytes_used, 0) >= u.data_limit_gb * 1073741824)
+                ''', (now, f'-{USAGE_WINDOW_DAYS} days', now))
+                offenders = cursor.fetchall()
+                
+                rows = [(username,) for username, _ in offenders]
+                cursor.executemany("UPDATE users SET status = 'disabled' WHERE username = ?", rows)
+                cursor.executemany('DELETE FROM active_sessions WHERE username = ?', rows)
+                sessions_removed = max(cursor.rowcount, 0)
         except Exception as e:
-            logger.error(f"Error killing processes for {username}: {e}")
+            logger.error(f"Error enforcing limits: {e}")
+            return {'error': str(e)}
+        
+        usernames = [username for username, _ in offenders]
+        for username in usernames:
+            self.admission.invalidate(username)
+        processes = self.kill_users_processes(usernames)
+        
+        report = {
+            'disabled': len(usernames),
+            'expired': sum(1 for _, reason in offenders if reason == 'expired'),
+            'over_quota': sum(1 for _, reason in offenders if reason == 'over_quota'),
+            'sessions_removed': sessions_removed,
+            'processes_signalled': processes,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'users': usernames
+        }
+        if usernames:
+            logger.info(f"Enforcement disabled {len(usernames)} accounts, removed {sessions_removed} sessions, "
+                        f"signalled {processes} processes in {report['duration_ms']}ms")
+        return report
+    
+    def kill_user_processes(self, username: str):
+        """Kill all processes for disabled user"""
+        self.kill_users_processes([username])
+        
+    def kill_users_processes(self, usernames: List[str]) -> int:
+        """SIGTERM the processes of the given users with one /proc walk
+        
+        Matches processes owned by the users' UIDs (SSH sessions) and V2Ray
+        processes whose command line names one of them, like the former
+        pkill -u / pkill -f pair. Returns the number of processes signalled.
+        """
+        if not usernames:
+            return 0
+        
+        uids = set()
+        for username in usernames:
+            try:
+                uids.add(pwd.getpwnam(username).pw_uid)
+            except KeyError:
+                pass
+        # Never signal root or ourselves, whatever the user list says
+        uids.discard(0)
+        v2ray = re.compile(rb'v2ray.*(?:' + b'|'.join(re.escape(u.encode()) for u in usernames) + rb')')
+        
+        signalled = 0
+        own_pid = os.getpid()
+        try:
+            pids = [int(name) for name in os.listdir('/proc') if name.isdigit()]
+        except OSError as e:
+            logger.error(f"Error listing processes: {e}")
+            return 0
+        
+        for pid in pids:
+            if pid == own_pid:
+                continue
+            try:
+                match = os.stat(f'/proc/{pid}').st_uid in uids
+                if not match:
+                    with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                        match = v2ray.search(f.read().replace(b'\0', b' ')) is not None
+                if match:
+                    os.kill(pid, signal.SIGTERM)
+                    signalled += 1
+            except (FileNotFoundError, ProcessLookupError):
+                # Process exited during the walk
+                continue
+            except PermissionError as e:
+                logger.error(f"Error signalling process {pid}: {e}")
+        
+        if signalled:
+            logger.info(f"Killed {signalled} processes for {len(usernames)} users")
+        return signalled
     
     def get_usage_report(self, username: str = None) -> Dict:
         """Get usage report for user or all users"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            if username:
-                cursor.execute('''
-                    SELECT u.username, u.user_type, u.data_limit_gb, u.expiry_date, u.status,
-                           COALESCE(SUM(ul.bytes_used), 0) as total_bytes,
-                           COUNT(ul.id) as total_sessions,
-                           (SELECT COUNT(*) FROM active_sessions WHERE username = u.username) as active_sessions
-                    FROM users u
-                    LEFT JOIN usage_logs ul ON u.username = ul.username
-                    WHERE u.username = ?
-                    GROUP BY u.username
-                ''', (username,))
-            else:
-                cursor.execute('''
-                    SELECT u.username, u.user_type, u.data_limit_gb, u.expiry_date, u.status,
-                           COALESCE(SUM(ul.bytes_used), 0) as total_bytes,
-                           COUNT(ul.id) as total_sessions,
-                           (SELECT COUNT(*) FROM active_sessions WHERE username = u.username) as active_sessions
-                    FROM users u
-                    LEFT JOIN usage_logs ul ON u.username = ul.username
-                    GROUP BY u.username
-                ''')
-            
-            results = cursor.fetchall()
-            conn.close()
-            
-            report = {}
-            for row in results:
-                report[row[0]] = {
-                    'username': row[0],
-                    'user_type': row[1],
-                    'data_limit_gb': row[2],
-                    'expiry_date': row[3],
-                    'status': row[4],
-                    'total_bytes': row[5],
-                    'total_sessions': row[6],
-                    'active_sessions': row[7],
-                    'data_used_gb': round(row[5] / (1024**3), 2)
-                }
-            
-            return report
+            return {row['username']: row for row in self.iter_usage_report(username=username)}
         except Exception as e:
             logger.error(f"Error getting usage report: {e}")
             return {}
+            
+    def report_filters(self, days=None, **values):
+        """Named parameters and WHERE clauses shared by the report queries"""
+        params = {name: value for name, value in values.items() if value is not None}
+        clauses = ''.join(f' AND u.{name} = :{name}' for name in params)
+        params['since'] = '' if days is None else time.strftime('%Y-%m-%d', time.gmtime(time.time() - days * 86400))
+        return clauses, params
+        
+    def iter_usage_report(self, status: str = None, user_type: str = None, days: int = None,
+                          username: str = None, page_size: int = REPORT_PAGE_SIZE):
+        """Yield report rows in username order, one keyset page per query
+        
+        Usage comes from the daily rollups, over the last days or all time.
+        Each page is a short read, so the report never holds more than
+        page_size rows nor blocks writers for long.
+        """
+        clauses, params = self.report_filters(days, status=status, user_type=user_type, username=username)
+        params.update(last='', limit=page_size)
+        while True:
+            with self.db.transaction() as conn:
+                # Per-user lookups are primary key ranges, so a page costs page_size probes
+                rows = conn.execute(f'''
+                    SELECT u.username, u.user_type, u.data_limit_gb, u.expiry_date, u.status,
+                           (SELECT COALESCE(SUM(bytes_used), 0) FROM usage_daily d
+                            WHERE d.username = u.username AND d.day > :since),
+                           (SELECT COALESCE(SUM(sessions), 0) FROM usage_daily d
+                            WHERE d.username = u.username AND d.day > :since),
+                           (SELECT COUNT(*) FROM active_sessions a WHERE a.username = u.username)
+                    FROM users u
+                    WHERE u.username > :last{clauses}
+                    ORDER BY u.username
+                    LIMIT :limit
+                ''', params).fetchall()
+            
+            for row in rows:
+                yield self.report_row(row)
+            if len(rows) < page_size:
+                return
+            params['last'] = rows[-1][0]
+            
+    def iter_top_usage(self, limit: int, status: str = None, user_type: str = None, days: int = None):
+        """Yield the limit users with the most usage, highest first"""
+        clauses, params = self.report_filters(days, status=status, user_type=user_type)
+        params['limit'] = limit
+        with self.db.transaction() as conn:
+            rows = conn.execute(f'''
+                SELECT u.username, u.user_type, u.data_limit_gb, u.expiry_date, u.status,
+                       d.total_bytes, d.total_sessions,
+                       (SELECT COUNT(*) FROM active_sessions a WHERE a.username = u.username)
+                FROM (
+                    SELECT username, SUM(bytes_used) AS total_bytes, SUM(sessions) AS total_sessions
+                    FROM usage_daily WHERE day > :since GROUP BY username
+                ) d
+                JOIN users u ON u.username = d.username
+                WHERE 1{clauses}
+                ORDER BY d.total_bytes DESC, u.username
+                LIMIT :limit
+            ''', params).fetchall()
+        for row in rows:
+            yield self.report_row(row)
+            
+    def report_row(self, row) -> Dict:
+        """Map a report query row to its fields"""
+        report = dict(zip(REPORT_FIELDS, row))
+        report['data_used_gb'] = round(row[5] / (1024**3), 2)
+        return report
     
     def cleanup_old_sessions(self):
         """Clean up old inactive sessions"""
+        # Buffered activity must land first or live sessions look idle
+        self.usage.flush()
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
             
-            # Remove sessions inactive for more than 1 hour
-            cursor.execute('''
-                DELETE FROM active_sessions 
-                WHERE last_activity < datetime('now', '-1 hour')
-            ''')
+                # Remove sessions inactive for more than 1 hour
+                cursor.execute('''
+                    DELETE FROM active_sessions 
+                    WHERE last_activity_ts < ?
+                ''', (int(time.time()) - 3600,))
+                
+                # Hourly buckets only serve recent graphs
+                cursor.execute('''
+                    DELETE FROM usage_hourly WHERE hour < strftime('%Y-%m-%d %H', 'now', ?)
+                ''', (f'-{HOURLY_RETENTION_HOURS} hours',))
             
-            conn.commit()
-            conn.close()
+            self.admission.invalidate()
             logger.info("Old sessions cleaned up")
         except Exception as e:
             logger.error(f"Error cleaning up sessions: {e}")
 
+def write_report(rows, fmt: str, out) -> int:
+    """Write report rows to out as they arrive, in jsonl or csv"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            out.write(json.dumps(row) + '\n')
+            count += 1
+    out.flush()
+    return count
+
+def run_report(argv: List[str]):
+    """Stream a usage report straight from the database"""
+    parser = argparse.ArgumentParser(prog='usage_limits.py report', description='Streaming usage report')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl', help='Output format')
+    parser.add_argument('--status', help='Only users with this status (active, disabled)')
+    parser.add_argument('--type', dest='user_type', help='Only users of this type (ssh, v2ray)')
+    parser.add_argument('--days', type=int, help='Usage over the last N days (default: all time)')
+    parser.add_argument('--top', type=int, help='Only the N users with the most usage')
+    parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+    args = parser.parse_args(argv)
+    
+    # Read-only and streamed, so it bypasses the daemon socket
+    manager = UsageLimitsManager()
+    if args.top:
+        rows = manager.iter_top_usage(args.top, args.status, args.user_type, args.days)
+    else:
+        rows = manager.iter_usage_report(args.status, args.user_type, args.days)
+    
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        count = write_report(rows, args.format, out)
+    finally:
+        if args.output:
+            out.close()
+        manager.close()
+    logger.info(f"Usage report written: {count} users")
+
+def run_benchmark(sessions: int = 500) -> Dict:
+    """Compare session throughput of connect-per-call against persistent WAL connections"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for label, persistent in (('per_call', False), ('persistent_wal', True)):
+            manager = UsageLimitsManager(os.path.join(tmpdir, f'{label}.db'), persistent)
+            for i in range(sessions):
+                manager.add_user(f'bench{i}', 'ssh', 100, 30, 5)
+            
+            started = time.perf_counter()
+            for i in range(sessions):
+                session_id = manager.start_session(f'bench{i}', 'ssh', '127.0.0.1')
+                manager.update_session_usage(session_id, 1024, 2048)
+                manager.end_session(session_id)
+            elapsed = time.perf_counter() - started
+            manager.close()
+            
+            results[label] = {
+                'sessions': sessions,
+                'seconds': round(elapsed, 3),
+                'sessions_per_sec': round(sessions / elapsed, 1) if elapsed else 0,
+                'admission_cache': manager.admission.stats()
+            }
+    
+    if results['per_call']['sessions_per_sec']:
+        results['speedup'] = round(results['persistent_wal']['sessions_per_sec'] /
+                                   results['per_call']['sessions_per_sec'], 2)
+    return results
+
+class ExpiryScheduler:
+    """Disables accounts at their expiry time
+    
+    Upcoming expiries sit in a min-heap loaded once from the status/expiry
+    index, and the thread sleeps until the earliest one. Heap entries are
+    hints only: due users are re-read from the database, so an account
+    extended in the meantime is rescheduled instead of disabled and entries
+    of disabled users are dropped.
+    """
+    
+    def __init__(self, manager, max_sleep=EXPIRY_MAX_SLEEP):
+        self.manager = manager
+        self.max_sleep = max_sleep
+        self.heap = []
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.thread = None
+        self.expired = 0
+        
+    def load(self):
+        """Fill the heap from the database"""
+        entries = [(expiry_ts, username) for username, expiry_ts in self.manager.get_expiry_schedule()]
+        heapq.heapify(entries)
+        with self.cond:
+            self.heap = entries
+            self.cond.notify()
+        logger.info(f"Expiry scheduler tracking {len(entries)} accounts")
+        
+    def schedule(self, entries):
+        """Add (username, expiry_ts) entries, waking the thread if one is earlier"""
+        with self.cond:
+            for username, expiry_ts in entries:
+                if expiry_ts is not None:
+                    heapq.heappush(self.heap, (expiry_ts, username))
+            self.cond.notify()
+            
+    def next_due(self):
+        """Wait until entries are due and pop them; None once stopping"""
+        with self.cond:
+            while not self.stopping:
+                now = time.time()
+                if self.heap and self.heap[0][0] <= now:
+                    due = set()
+                    while self.heap and self.heap[0][0] <= now:
+                        due.add(heapq.heappop(self.heap)[1])
+                    return sorted(due)
+                timeout = self.max_sleep
+                if self.heap:
+                    timeout = min(timeout, self.heap[0][0] - now)
+                self.cond.wait(timeout)
+            return None
+            
+    def run(self):
+        """Expire accounts until stopped"""
+        try:
+            while True:
+                due = self.next_due()
+                if due is None:
+                    return
+                try:
+                    expired, later = self.manager.expire_users(due)
+                    self.expired += len(expired)
+                    self.schedule(later)
+                except Exception as e:
+                    logger.error(f"Error expiring accounts: {e}")
+                    # Retry on the next wake-up rather than losing the entries
+                    retry_at = time.time() + self.max_sleep
+                    self.schedule([(username, retry_at) for username in due])
+        finally:
+            self.manager.db.release()
+            
+    def start(self):
+        """Load the schedule and start the thread"""
+        self.load()
+        self.manager.on_expiry = self.schedule
+        self.thread = threading.Thread(target=self.run, name='usage-expiry', daemon=True)
+        self.thread.start()
+        
+    def stop(self):
+        """Stop the thread"""
+        self.manager.on_expiry = None
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+            
+    def stats(self):
+        """Return scheduler counters"""
+        with self.cond:
+            return {
+                'scheduled': len(self.heap),
+                'next_expiry': int(self.heap[0][0]) if self.heap else None,
+                'expired': self.expired
+            }
+            
+class UsageRequestHandler(socketserver.StreamRequestHandler):
+    """Serve JSON-lines requests on one client connection
+    
+    Each request is {"cmd": <method>, "args": [...]} and each reply is
+    {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+    """
+    
+    def handle(self):
+        """Answer requests until the client disconnects"""
+        daemon = self.server.daemon
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                reply = {'ok': True, 'result': daemon.dispatch(request['cmd'], request.get('args', []))}
+            except Exception as e:
+                daemon.count('errors')
+                reply = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(reply).encode() + b'\n')
+            self.wfile.flush()
+            
+    def finish(self):
+        """Close this thread's database connection"""
+        try:
+            super().finish()
+        finally:
+            self.server.daemon.manager.db.release()
+            
+class UsageServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix socket server"""
+    daemon_threads = True
+    
+class UsageDaemon:
+    """Keeps a UsageLimitsManager resident behind a Unix socket"""
+    
+    def __init__(self, socket_path=USAGE_SOCKET, manager=None):
+        self.socket_path = socket_path
+        self.manager = manager or UsageLimitsManager()
+        self.expiry = ExpiryScheduler(self.manager)
+        self.last_sweep = None
+        self.sweeper = None
+        self.server = None
+        self.requests = 0
+        self.errors = 0
+        self.stats_lock = threading.Lock()
+        self.start_time = time.time()
+        self.stopped = threading.Event()
+        
+    def dispatch(self, cmd, args):
+        """Run one request against the manager"""
+        self.count('requests')
+        if cmd == 'ping':
+            return 'pong'
+        if cmd == 'stats':
+            return self.stats()
+        if cmd not in RPC_METHODS:
+            raise ValueError(f"Unknown command: {cmd}")
+        return getattr(self.manager, cmd)(*args)
+        
+    def count(self, counter):
+        """Increment a request counter; handler threads call this concurrently"""
+        with self.stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            
+    def stats(self):
+        """Return daemon counters"""
+        with self.stats_lock:
+            requests, errors = self.requests, self.errors
+        return {
+            'uptime': int(time.time() - self.start_time),
+            'requests': requests,
+            'errors': errors,
+            'admission_cache': self.manager.admission.stats(),
+            'usage_buffer': dict(self.manager.usage.stats, pending=len(self.manager.usage.pending)),
+            'expiry': self.expiry.stats(),
+            'last_sweep': self.last_sweep
+        }
+        
+    def sweep_loop(self):
+        """Run the enforcement sweep every ENFORCE_INTERVAL seconds"""
+        try:
+            while not self.stopped.wait(ENFORCE_INTERVAL):
+                report = self.manager.enforce_limits()
+                report.pop('users', None)
+                self.last_sweep = dict(report, time=int(time.time()))
+        finally:
+            self.manager.db.release()
+        
+    def bind(self):
+        """Create the socket, replacing a stale one"""
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise RuntimeError(f"Daemon already running on {self.socket_path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(self.socket_path)
+            finally:
+                probe.close()
+        os.makedirs(os.path.dirname(self.socket_path), mode=0o755, exist_ok=True)
+        self.server = UsageServer(self.socket_path, UsageRequestHandler)
+        self.server.daemon = self
+        os.chmod(self.socket_path, 0o660)
+        
+    def start(self):
+        """Serve requests in a background thread"""
+        self.bind()
+        self.expiry.start()
+        thread = threading.Thread(target=self.server.serve_forever, name='usage-daemon', daemon=True)
+        thread.start()
+        if ENFORCE_INTERVAL > 0:
+            self.sweeper = threading.Thread(target=self.sweep_loop, name='usage-sweep', daemon=True)
+            self.sweeper.start()
+        logger.info(f"Usage limits daemon listening on {self.socket_path}")
+        
+    def stop(self):
+        """Stop serving, flush usage and remove the socket"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.stopped.set()
+        if self.sweeper is not None:
+            self.sweeper.join()
+        self.expiry.stop()
+        self.manager.close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        logger.info("Usage limits daemon stopped")
+        
+    def signal_handler(self, signum, frame):
+        """Handle shutdown signals"""
+        logger.info(f"Received signal {signum}, shutting down...")
+        self.stopped.set()
+        
+    def run(self):
+        """Serve until SIGTERM or SIGINT"""
+        signal.signal(signal.SIGINT, self.signal_handler)
+        signal.signal(signal.SIGTERM, self.signal_handler)
+        self.start()
+        try:
+            while not self.stopped.wait(1):
+                pass
+        finally:
+            self.stop()
+            
+class UsageClient:
+    """Client for the usage limits daemon
+    
+    Attribute access mirrors UsageLimitsManager, so callers can use
+    client.check_user_limits(name) on either one.
+    """
+    
+    def __init__(self, socket_path=USAGE_SOCKET, timeout=USAGE_CLIENT_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.sock = None
+        self.file = None
+        
+    def connect(self):
+        """Open the socket; raises OSError when no daemon is listening"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.file = sock.makefile('rwb')
+        
+    def call(self, cmd, *args):
+        """Send one request and return its result"""
+        if self.sock is None:
+            self.connect()
+        self.file.write(json.dumps({'cmd': cmd, 'args': args}).encode() + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            self.close()
+            raise ConnectionError("Usage limits daemon closed the connection")
+        reply = json.loads(line)
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+        
+    def __getattr__(self, name):
+        if name not in RPC_METHODS:
+            raise AttributeError(name)
+        return lambda *args: self.call(name, *args)
+        
+    def close(self):
+        """Close the connection"""
+        if self.sock is not None:
+            self.file.close()
+            self.sock.close()
+            self.sock = None
+            self.file = None
+            
+def connect_manager():
+    """Return a daemon client when one is running, else a direct manager"""
+    if os.path.exists(USAGE_SOCKET):
+        client = UsageClient()
+        try:
+            client.call('ping')
+            return client
+        except (OSError, ValueError):
+            client.close()
+    return UsageLimitsManager()
+
 def main():
     """Main function for CLI usage"""
     if len(sys.argv) < 2:
@@ -387,13 +1546,44 @@ def main():
         print("  add_user <username> <type> [data_gb] [days] [connections]")
         print("  check_limits <username>")
         print("  get_report [username]")
+        print("  report [--format jsonl|csv] [--status S] [--type T] [--days N] [--top N] [-o FILE]")
+        print("  hourly_usage <username> [hours]")
         print("  disable_user <username>")
+        print("  import_users <file>   CSV (username,type,data_gb,days,connections) or JSON lines")
+        print("  bulk_extend <file>    username,days")
+        print("  bulk_limits <file>    username,data_gb,connections")
+        print("  bulk_disable <file>   username")
         print("  cleanup")
+        print("  enforce               disable all expired/over-quota users now")
+        print("  benchmark [sessions]")
+        print("  serve                 run the daemon on USAGE_SOCKET")
+        print("  stats                 daemon counters")
         return
     
-    manager = UsageLimitsManager()
     command = sys.argv[1]
     
+    if command == 'benchmark':
+        sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+        print(json.dumps(run_benchmark(sessions), indent=2))
+        return
+    
+    if command == 'report':
+        run_report(sys.argv[2:])
+        return
+    
+    if command == 'serve':
+        UsageDaemon().run()
+        return
+    
+    if command == 'stats':
+        try:
+            print(json.dumps(UsageClient().call('stats'), indent=2))
+        except OSError as e:
+            print(f"Usage limits daemon not reachable: {e}")
+        return
+    
+    manager = connect_manager()
+    
     if command == 'add_user':
         if len(sys.argv) < 4:
             print("Usage: add_user <username> <type> [data_gb] [days] [connections]")
@@ -422,6 +1612,14 @@ def main():
         report = manager.get_usage_report(username)
         print(json.dumps(report, indent=2))
     
+    elif command == 'hourly_usage':
+        if len(sys.argv) < 3:
+            print("Usage: hourly_usage <username> [hours]")
+            return
+        
+        hours = int(sys.argv[3]) if len(sys.argv) > 3 else 24
+        print(json.dumps(manager.get_hourly_usage(sys.argv[2], hours), indent=2))
+    
     elif command == 'disable_user':
         if len(sys.argv) < 3:
             print("Usage: disable_user <username>")
@@ -431,6 +1629,21 @@ def main():
         success = manager.disable_user(username)
         print(f"User disabled: {success}")
     
+    elif command in ('import_users', 'bulk_extend', 'bulk_limits', 'bulk_disable'):
+        if len(sys.argv) < 3:
+            print(f"Usage: {command} <file>")
+            return
+        
+        operation = 'import' if command == 'import_users' else command[len('bulk_'):]
+        # Absolute, since the daemon may be the one reading the file
+        report = manager.bulk_from_file(operation, os.path.abspath(sys.argv[2]))
+        print(json.dumps(report, indent=2))
+        if report['errors']:
+            sys.exit(1)
+    
+    elif command == 'enforce':
+        print(json.dumps(manager.enforce_limits(), indent=2))
+    
     elif command == 'cleanup':
         manager.cleanup_old_sessions()
         print("Cleanup completed")
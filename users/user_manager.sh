@@ -1208,6 +1208,20 @@ bulk_user_operations() {
     done
 }
 
+# Register users listed in a CSV file with the usage limits system in one batch
+import_usage_limits() {
+    local limits_file="$1"
+    
+    if [ -s "$limits_file" ] && [ -f "/opt/mastermind/users/usage_limits.py" ]; then
+        if python3 /opt/mastermind/users/usage_limits.py import_users "$limits_file" > /dev/null; then
+            log_info "Users added to usage limits system"
+        else
+            log_error "Some users could not be added to the usage limits system"
+        fi
+    fi
+    rm -f "$limits_file"
+}
+
 # Create multiple users
 create_multiple_users() {
     echo
@@ -1217,6 +1231,7 @@ create_multiple_users() {
     local count=$(get_input "Number of users to create" "validate_number" "1")
     local prefix=$(get_input "Username prefix" "" "user")
     local start_number=$(get_input "Starting number" "validate_number" "1")
+    local limits_file=$(mktemp)
     
     echo
     for ((i=0; i<count; i++)); do
@@ -1229,11 +1244,14 @@ create_multiple_users() {
             
             echo -e "Created user: $username with password: $password"
             echo "$(date): Created user $username" >> /var/log/mastermind/user-management.log
+            echo "$username,ssh,10,30,3" >> "$limits_file"
         else
             echo -e "User $username already exists, skipping"
         fi
     done
     
+    import_usage_limits "$limits_file"
+    
     echo
     wait_for_key
 }
@@ -1340,6 +1358,7 @@ import_users_from_file() {
         echo -e "${YELLOW}Importing users from $import_file${NC}"
         echo
         
+        local limits_file=$(mktemp)
         while IFS=, read -r username password shell sudo_access; do
             # Skip empty lines and comments
             if [[ -z "$username" || "$username" =~ ^# ]]; then
@@ -1356,11 +1375,13 @@ import_users_from_file() {
                 
                 echo "Created user: $username"
                 echo "$(date): Imported user $username" >> /var/log/mastermind/user-management.log
+                echo "$username,ssh,10,30,3" >> "$limits_file"
             else
                 echo "User $username already exists, skipping"
             fi
         done < "$import_file"
         
+        import_usage_limits "$limits_file"
         log_info "User import completed"
     else
         log_error "Import file not found: $import_file"